@@ -5,10 +5,18 @@ from passlib.context import CryptContext
 
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from models import User
+from schemas import CurrentUser
 from database import get_db
+from cache import cache_get, cache_set
+from collections import OrderedDict
+import hashlib
+import hmac
 import os
+import threading
+import time
 import warnings
 from dotenv import load_dotenv
 
@@ -18,9 +26,13 @@ warnings.filterwarnings("ignore", message=".*bcrypt.*")
 # Load environment variables
 load_dotenv()
 
-# Password hashing
+# Password hashing (bcrypt is kept only to verify and upgrade existing hashes)
 pwd_context = CryptContext(
-    schemes=["bcrypt"], deprecated="auto", bcrypt__default_rounds=12
+    schemes=["argon2", "bcrypt"],
+    deprecated="auto",
+    argon2__memory_cost=19456,
+    argon2__time_cost=2,
+    argon2__parallelism=1,
 )
 
 # JWT Configuration
@@ -28,6 +40,13 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 
+# Authenticated user cache configuration
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "300"))
+
+# Recently verified logins configuration
+VERIFY_CACHE_SIZE = int(os.getenv("VERIFY_CACHE_SIZE", "1024"))
+VERIFY_CACHE_TTL = int(os.getenv("VERIFY_CACHE_TTL", "300"))
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash."""
@@ -68,12 +87,47 @@ def verify_token(token: str) -> Optional[str]:
 
 def get_user_by_username(db: Session, username: str) -> Optional[User]:
     """Get a user by username."""
-    return db.query(User).filter(User.username == username).first()
+    return db.scalars(select(User).where(User.username == username)).first()
 
 
 def get_user_by_email(db: Session, email: str) -> Optional[User]:
     """Get a user by email."""
-    return db.query(User).filter(User.email == email).first()
+    return db.scalars(select(User).where(User.email == email)).first()
+
+
+# Successful logins, keyed by a MAC of (stored hash, password) so neither the
+# password nor a cheap hash of it is kept in memory. Keying on the stored hash
+# means a password change invalidates its entries.
+_verified_logins: "OrderedDict[str, float]" = OrderedDict()
+_verified_logins_lock = threading.Lock()
+
+
+def _login_key(hashed_password: str, password: str) -> str:
+    """Cache key for a successful password verification."""
+    message = hashed_password.encode() + b"\0" + password.encode()
+    return hmac.new(SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+
+def _is_recently_verified(key: str) -> bool:
+    """Check whether a login was verified within VERIFY_CACHE_TTL."""
+    with _verified_logins_lock:
+        expires = _verified_logins.get(key)
+        if expires is None:
+            return False
+        if expires < time.monotonic():
+            del _verified_logins[key]
+            return False
+        _verified_logins.move_to_end(key)
+        return True
+
+
+def _remember_verified(key: str) -> None:
+    """Record a successful verification, evicting the oldest past the limit."""
+    with _verified_logins_lock:
+        _verified_logins[key] = time.monotonic() + VERIFY_CACHE_TTL
+        _verified_logins.move_to_end(key)
+        while len(_verified_logins) > VERIFY_CACHE_SIZE:
+            _verified_logins.popitem(last=False)
 
 
 def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
@@ -81,11 +135,39 @@ def authenticate_user(db: Session, username: str, password: str) -> Optional[Use
     user = get_user_by_username(db, username)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+
+    # Skip the KDF for repeat logins
+    login_key = _login_key(user.hashed_password, password)
+    if _is_recently_verified(login_key):
+        return user
+
+    valid, new_hash = pwd_context.verify_and_update(password, user.hashed_password)
+    if not valid:
         return None
+
+    # Rehash passwords stored with a deprecated scheme or parameters
+    if new_hash is not None:
+        user.hashed_password = new_hash
+        db.commit()
+        login_key = _login_key(new_hash, password)
+
+    _remember_verified(login_key)
     return user
 
 
+def _user_cache_key(token: str) -> str:
+    """Cache key for the user a token resolves to (never stores the token)."""
+    return "u:" + hashlib.blake2b(token.encode(), digest_size=16).hexdigest()
+
+
+def _token_ttl(token: str) -> int:
+    """Seconds until an already verified token expires."""
+    expire = jwt.get_unverified_claims(token).get("exp")
+    if expire is None:
+        return 0
+    return int(expire - time.time())
+
+
 # JWT Bearer token scheme
 security = HTTPBearer()
 
@@ -93,7 +175,7 @@ security = HTTPBearer()
 def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db),
-) -> User:
+) -> CurrentUser:
     """Get the current authenticated user from JWT token."""
     token = credentials.credentials
     username = verify_token(token)
@@ -104,6 +186,12 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    # Skip the user lookup for tokens seen recently
+    cache_key = _user_cache_key(token)
+    cached = cache_get(cache_key)
+    if cached is not None:
+        return CurrentUser.model_validate_json(cached)
+
     user = get_user_by_username(db, username)
     if user is None:
         raise HTTPException(
@@ -112,4 +200,11 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    return user
+    current_user = CurrentUser.model_validate(user)
+
+    # Never cache past the token's own expiry
+    ttl = min(USER_CACHE_TTL, _token_ttl(token))
+    if ttl > 0:
+        cache_set(cache_key, current_user.model_dump_json().encode(), ttl)
+
+    return current_user
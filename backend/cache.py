@@ -0,0 +1,96 @@
+from typing import List, Optional
+import os
+import time
+import redis
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Redis Configuration (caching is disabled when REDIS_URL is not set)
+REDIS_URL = os.getenv("REDIS_URL")
+REDIS_TIMEOUT = float(os.getenv("REDIS_TIMEOUT", "0.2"))
+PUBLIC_CACHE_TTL = int(os.getenv("PUBLIC_CACHE_TTL", "300"))
+# Seconds to skip Redis entirely after a failed call
+CACHE_RETRY_AFTER = float(os.getenv("CACHE_RETRY_AFTER", "5"))
+
+
+def create_cache_client() -> Optional[redis.Redis]:
+    """Create a Redis client from REDIS_URL, or None if caching is disabled."""
+    if not REDIS_URL:
+        return None
+    return redis.Redis.from_url(
+        REDIS_URL, socket_timeout=REDIS_TIMEOUT, socket_connect_timeout=REDIS_TIMEOUT
+    )
+
+
+cache_client = create_cache_client()
+
+
+# A failing cache must never fail the request, so Redis errors are treated
+# as cache misses and writes are best-effort. After an error reads and fills
+# skip the cache for CACHE_RETRY_AFTER seconds, so an outage costs one timeout
+# rather than one per call. Invalidations are always attempted: skipping one
+# would leave other workers serving the stale entry.
+_unavailable_until = 0.0
+
+
+def _cache_available() -> bool:
+    return cache_client is not None and time.monotonic() >= _unavailable_until
+
+
+def _mark_unavailable() -> None:
+    global _unavailable_until
+    _unavailable_until = time.monotonic() + CACHE_RETRY_AFTER
+
+
+def cache_get(key: str) -> Optional[bytes]:
+    """Get a cached value, or None on a miss."""
+    if not _cache_available():
+        return None
+    try:
+        return cache_client.get(key)
+    except redis.RedisError:
+        _mark_unavailable()
+        return None
+
+
+def cache_get_many(*keys: str) -> List[Optional[bytes]]:
+    """Get several cached values in one round trip, with None for each miss."""
+    if not _cache_available():
+        return [None] * len(keys)
+    try:
+        return cache_client.mget(keys)
+    except redis.RedisError:
+        _mark_unavailable()
+        return [None] * len(keys)
+
+
+def cache_set(key: str, value: bytes, ttl: int = PUBLIC_CACHE_TTL) -> None:
+    """Cache a value for ttl seconds."""
+    if not _cache_available():
+        return
+    try:
+        cache_client.setex(key, ttl, value)
+    except redis.RedisError:
+        _mark_unavailable()
+
+
+def cache_delete(*keys: str) -> None:
+    """Remove cached values."""
+    if cache_client is None:
+        return
+    try:
+        cache_client.delete(*keys)
+    except redis.RedisError:
+        _mark_unavailable()
+
+
+def cache_incr(key: str) -> None:
+    """Increment a counter key, e.g. to invalidate a family of cached values."""
+    if cache_client is None:
+        return
+    try:
+        cache_client.incr(key)
+    except redis.RedisError:
+        _mark_unavailable()
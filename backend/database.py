@@ -1,6 +1,8 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 import os
 from dotenv import load_dotenv
 
@@ -10,8 +12,42 @@ load_dotenv()
 # Database URL from environment variable
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./snipvault.db")
 
+# Connection pool configuration
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "3600"))
+
+DATABASE_URL_PARTS = make_url(DATABASE_URL)
+
+# Driver-specific options: psycopg2 sends executemany UPDATE/DELETE in pages
+# (multi-row INSERTs are already batched by SQLAlchemy's insertmanyvalues)
+DRIVER_OPTIONS = {}
+if DATABASE_URL_PARTS.get_driver_name() == "psycopg2":
+    DRIVER_OPTIONS = {
+        "executemany_mode": "values_plus_batch",
+        "executemany_batch_page_size": 500,
+    }
+
+# Sizing options only apply to QueuePool (in-memory SQLite uses a
+# SingletonThreadPool, which rejects them)
+POOL_OPTIONS = {}
+POOL_CLASS = DATABASE_URL_PARTS.get_dialect().get_pool_class(DATABASE_URL_PARTS)
+if issubclass(POOL_CLASS, QueuePool):
+    POOL_OPTIONS = {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+    }
+
 # Create SQLAlchemy engine
-engine = create_engine(DATABASE_URL)
+engine = create_engine(
+    DATABASE_URL,
+    pool_pre_ping=True,  # Drop dead connections before handing them out
+    pool_recycle=DB_POOL_RECYCLE,
+    **POOL_OPTIONS,
+    **DRIVER_OPTIONS,
+)
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
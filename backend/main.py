@@ -1,8 +1,12 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Query, Response
+from fastapi import FastAPI, Depends, HTTPException, status, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy import Select, delete, func, insert, not_, select, text, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
-from database import get_db, engine, Base
+from pydantic import TypeAdapter
+from database import SessionLocal, get_db
 from auth import (
     get_password_hash,
     authenticate_user,
@@ -14,6 +18,7 @@ from auth import (
 from schemas import (
     UserCreate,
     UserResponse,
+    CurrentUser,
     UserLogin,
     Token,
     SnippetCreate,
@@ -22,14 +27,19 @@ from schemas import (
     TagCreate,
     TagResponse,
 )
-from models import User, Snippet, Tag
-from typing import List, Optional
+from models import User, Snippet, Tag, snippet_tags
+from cache import cache_get_many, cache_set, cache_delete, cache_incr
+from typing import Iterator, List, Optional, Tuple
 from datetime import datetime
+import base64
+import hashlib
+import json
 
 app = FastAPI(
     title="SnipVault API",
     description="A secure code snippet management system",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
 )
 
 # Add CORS middleware
@@ -39,8 +49,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+# Compress larger responses (snippet lists carry full code bodies)
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 
 @app.get("/")
 async def root():
@@ -56,13 +70,15 @@ async def health_check():
     return {"status": "healthy"}
 
 
+# Built once; the compiled form is reused from the dialect's statement cache
+_HEALTH_SQL = text("SELECT 1")
+
+
 @app.get("/db-test")
-async def test_db(db: Session = Depends(get_db)):
+def test_db(db: Session = Depends(get_db)):
     try:
         # Test database connection
-        from sqlalchemy import text
-
-        db.execute(text("SELECT 1"))
+        db.execute(_HEALTH_SQL)
         return {"status": "Database connection successful"}
     except Exception as e:
         return {"status": "Database connection failed", "error": str(e)}
@@ -72,7 +88,7 @@ async def test_db(db: Session = Depends(get_db)):
 @app.post(
     "/auth/signup", response_model=UserResponse, status_code=status.HTTP_201_CREATED
 )
-async def signup(user_data: UserCreate, db: Session = Depends(get_db)):
+def signup(user_data: UserCreate, db: Session = Depends(get_db)):
     """Create a new user account."""
     # Check if username already exists
     if get_user_by_username(db, user_data.username):
@@ -104,7 +120,7 @@ async def signup(user_data: UserCreate, db: Session = Depends(get_db)):
 
 
 @app.post("/auth/login", response_model=Token)
-async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
+def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
     """Authenticate user and return JWT token."""
     user = authenticate_user(db, user_credentials.username, user_credentials.password)
     if not user:
@@ -120,242 +136,432 @@ async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
 
 # Protected routes
 @app.get("/users/me", response_model=UserResponse)
-async def get_current_user_info(current_user: User = Depends(get_current_user)):
+async def get_current_user_info(current_user: CurrentUser = Depends(get_current_user)):
     """Get current user information."""
     return current_user
 
 
-# Snippet routes
-@app.get("/snippets/", response_model=List[SnippetResponse])
-async def get_snippets(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
-    skip: int = 0,
-    limit: int = 100,
-    language: Optional[str] = None,
-    tag: Optional[List[str]] = Query(None),
+# INSERT constructs that support ON CONFLICT DO NOTHING, by dialect name
+_UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def _get_or_create_tags(db: Session, tag_names: List[str]) -> List[Tag]:
+    """Resolve tag names to Tag rows, creating any that don't exist yet."""
+    # Normalize tag names to lowercase for case-insensitive handling,
+    # dropping duplicates while keeping the order they were given in
+    names = list(dict.fromkeys(tag_name.lower() for tag_name in tag_names))
+
+    # Look up all existing tags in a single query
+    existing = {
+        tag.name: tag for tag in db.scalars(select(Tag).where(Tag.name.in_(names)))
+    }
+
+    missing = [name for name in names if name not in existing]
+    if missing:
+        rows = [{"name": name} for name in missing]
+        upsert_insert = _UPSERT_INSERTS.get(db.get_bind().dialect.name)
+        if upsert_insert is not None:
+            # Create them in one statement; tags another request created in the
+            # meantime are skipped rather than violating the unique constraint
+            db.execute(
+                upsert_insert(Tag)
+                .values(rows)
+                .on_conflict_do_nothing(index_elements=["name"])
+            )
+        else:
+            # Portable fallback for dialects without ON CONFLICT DO NOTHING
+            db.execute(insert(Tag), rows)
+        existing.update(
+            (tag.name, tag)
+            for tag in db.scalars(select(Tag).where(Tag.name.in_(missing)))
+        )
+
+    return [existing[name] for name in names]
+
+
+def _parse_iso(value: str, field_name: str) -> datetime:
+    """Parse an ISO 8601 query parameter, rejecting malformed values."""
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid {field_name} date format. Use ISO format (YYYY-MM-DDTHH:MM:SS)",
+        )
+
+
+# Pagination bounds (deep pages should use the cursor instead of skip)
+MAX_PAGE_SIZE = 200
+MAX_SKIP = 10_000
+
+
+# Keyset pagination
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# Snippet ids are 32-bit integer columns; larger cursors can't be bound
+MAX_CURSOR_ID = 2**31 - 1
+
+
+def _encode_cursor(snippet_id: int) -> str:
+    return base64.urlsafe_b64encode(str(snippet_id).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> int:
+    try:
+        snippet_id = int(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        snippet_id = None
+    if snippet_id is None or not 1 <= snippet_id <= MAX_CURSOR_ID:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+    return snippet_id
+
+
+def _next_cursor(snippets: List[Snippet], limit: int) -> Optional[str]:
+    """Cursor for the page after this one, or None if this is the last page."""
+    if not snippets or len(snippets) < limit:
+        return None
+    return _encode_cursor(snippets[-1].id)
+
+
+# Response serialization
+# Snippets are dumped straight to JSON bytes by pydantic-core, skipping the
+# jsonable_encoder pass FastAPI runs on returned objects
+_snippet_list_adapter = TypeAdapter(List[SnippetResponse])
+
+
+def _serialize_snippet(snippet: Snippet) -> bytes:
+    return SnippetResponse.model_validate(snippet).model_dump_json().encode()
+
+
+def _serialize_snippets(snippets: List[Snippet]) -> bytes:
+    return _snippet_list_adapter.dump_json(
+        _snippet_list_adapter.validate_python(snippets, from_attributes=True)
+    )
+
+
+def _ndjson_lines(bind, query: Select) -> Iterator[bytes]:
+    # The stream opens its own session: FastAPI closes dependency sessions
+    # before a streamed body is sent (since 0.106), so the request's can't be used
+    with SessionLocal(bind=bind) as db:
+        for snippet in db.scalars(query.execution_options(yield_per=50)):
+            yield _serialize_snippet(snippet) + b"\n"
+
+
+def _json_response(content: bytes, next_cursor: Optional[str] = None) -> Response:
+    response = Response(content=content, media_type="application/json")
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return response
+
+
+# Public snippet caching
+PUBLIC_CACHE_VERSION_KEY = "pub:list:version"
+PUBLIC_CACHE_CONTROL = "public, max-age=60, stale-while-revalidate=300"
+
+
+# The version is bumped whenever a public snippet changes, which invalidates
+# every cached response at once. Entries are stamped with the version read
+# before the database was, so a response computed from a row that changed
+# meanwhile carries an old version and is never served.
+def _public_snippet_cache_key(snippet_id: int) -> str:
+    return f"pub:snippet:{snippet_id}"
+
+
+def _public_list_cache_key(**params) -> str:
+    """Build the cache key for one page of the public snippet list."""
+    digest = hashlib.blake2b(
+        json.dumps(params, sort_keys=True).encode(), digest_size=16
+    ).hexdigest()
+    return f"pub:list:{digest}"
+
+
+def _public_cache_get(cache_key: str) -> Tuple[bytes, Optional[bytes]]:
+    """Fetch the cache version and a current entry for cache_key in one trip."""
+    version, cached = cache_get_many(PUBLIC_CACHE_VERSION_KEY, cache_key)
+    version = version or b"0"
+    if cached is not None:
+        cached_version, _, content = cached.partition(b"\n")
+        if cached_version == version:
+            return version, content
+    return version, None
+
+
+def _public_cache_set(cache_key: str, version: bytes, content: bytes) -> None:
+    cache_set(cache_key, version + b"\n" + content)
+
+
+def _invalidate_public_cache(snippet_id: int) -> None:
+    """Drop cached public responses that may include the given snippet."""
+    cache_delete(_public_snippet_cache_key(snippet_id))
+    cache_incr(PUBLIC_CACHE_VERSION_KEY)
+
+
+def _cache_page(
+    cache_key: str, version: bytes, content: bytes, next_cursor: Optional[str]
+) -> None:
+    # Cached list pages carry their next cursor on a first line of their own
+    _public_cache_set(
+        cache_key, version, (next_cursor or "").encode() + b"\n" + content
+    )
+
+
+def _cached_page_response(cached: bytes) -> Response:
+    next_cursor, _, content = cached.partition(b"\n")
+    return _json_response(content, next_cursor.decode())
+
+
+def _etag_matches(etag: str, if_none_match: str) -> bool:
+    """Check an If-None-Match header using weak comparison (RFC 9110 13.1.2)."""
+    if if_none_match.strip() == "*":
+        return True
+    opaque_tag = etag.removeprefix("W/")
+    return any(
+        value.strip().removeprefix("W/") == opaque_tag
+        for value in if_none_match.split(",")
+    )
+
+
+def _conditional_response(content: bytes, request: Request) -> Response:
+    """Respond with ETag/Cache-Control headers, or 304 if the client is current."""
+    # Weak, since GZipMiddleware may send the same tag on a compressed body
+    etag = f'W/"{hashlib.blake2b(content, digest_size=12).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": PUBLIC_CACHE_CONTROL}
+
+    if _etag_matches(etag, request.headers.get("if-none-match", "")):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    response = _json_response(content)
+    response.headers.update(headers)
+    return response
+
+
+def _build_snippet_query(
+    base_filter,
+    *,
+    language: Optional[str],
+    tag: Optional[List[str]],
+    created_after: Optional[str],
+    created_before: Optional[str],
+    cursor: Optional[str],
     is_public: Optional[bool] = None,
-    created_after: Optional[str] = None,
-    created_before: Optional[str] = None,
-):
-    """Get all snippets for the current user with optional filtering."""
-    query = db.query(Snippet).filter(Snippet.user_id == current_user.id)
+) -> Select:
+    """Build the filtered, newest-first query shared by the list endpoints."""
+    query = select(Snippet).where(base_filter)
 
     # Apply filters
     if language:
-        query = query.filter(Snippet.language == language)
+        query = query.where(Snippet.language == language)
 
     if is_public is not None:
-        query = query.filter(Snippet.is_public == is_public)
+        query = query.where(Snippet.is_public == is_public)
 
     if created_after:
-        try:
-            created_after_date = datetime.fromisoformat(
-                created_after.replace("Z", "+00:00")
-            )
-            query = query.filter(Snippet.created_at >= created_after_date)
-        except ValueError:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid created_after date format. Use ISO format (YYYY-MM-DDTHH:MM:SS)",
-            )
+        query = query.where(
+            Snippet.created_at >= _parse_iso(created_after, "created_after")
+        )
 
     if created_before:
-        try:
-            created_before_date = datetime.fromisoformat(
-                created_before.replace("Z", "+00:00")
-            )
-            query = query.filter(Snippet.created_at <= created_before_date)
-        except ValueError:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid created_before date format. Use ISO format (YYYY-MM-DDTHH:MM:SS)",
-            )
+        query = query.where(
+            Snippet.created_at <= _parse_iso(created_before, "created_before")
+        )
 
     # Apply multiple tag filters (many-to-many relationship)
     if tag:
-        # For multiple tags, we need to ensure the snippet has ALL specified tags
-        for tag_name in tag:
-            normalized_tag = tag_name.lower()
-            # Use a subquery to find snippets that have this specific tag
-            subquery = (
-                db.query(Snippet.id)
-                .join(Snippet.tags)
-                .filter(Tag.name == normalized_tag)
-                .subquery()
-            )
-            query = query.filter(Snippet.id.in_(subquery))
+        # For multiple tags, we need to ensure the snippet has ALL specified tags:
+        # keep only snippets matching as many distinct tags as were requested
+        tag_names = {tag_name.lower() for tag_name in tag}
+        query = (
+            query.join(Snippet.tags)
+            .where(Tag.name.in_(tag_names))
+            .group_by(Snippet.id)
+            .having(func.count(func.distinct(Tag.name)) == len(tag_names))
+        )
 
-    # Apply pagination
-    snippets = query.offset(skip).limit(limit).all()
-    return snippets
+    # Apply keyset pagination, newest first. Pages without a cursor use the
+    # same order (so skip/limit pages are newest first too); the lists used
+    # to come back unordered, in whatever order the database chose
+    if cursor:
+        query = query.where(Snippet.id < _decode_cursor(cursor))
+    return query.order_by(Snippet.id.desc())
+
+
+def _list_public_snippets(db: Session, *, skip: int, limit: int, **filters) -> Response:
+    """Serve one page of public snippets, from the cache when possible."""
+    cache_key = _public_list_cache_key(skip=skip, limit=limit, **filters)
+    version, cached = _public_cache_get(cache_key)
+    if cached is not None:
+        return _cached_page_response(cached)
+
+    query = _build_snippet_query(Snippet.is_public == True, **filters)
+    snippets = db.scalars(query.offset(skip).limit(limit)).all()
+    next_cursor = _next_cursor(snippets, limit)
+    content = _serialize_snippets(snippets)
+    _cache_page(cache_key, version, content, next_cursor)
+    return _json_response(content, next_cursor)
+
+
+def _get_public_snippet(db: Session, snippet_id: int, request: Request) -> Response:
+    """Serve a single public snippet, from the cache when possible."""
+    cache_key = _public_snippet_cache_key(snippet_id)
+    version, cached = _public_cache_get(cache_key)
+    if cached is not None:
+        return _conditional_response(cached, request)
+
+    snippet = db.scalars(
+        select(Snippet).where(Snippet.id == snippet_id, Snippet.is_public == True)
+    ).first()
+    if not snippet:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Public snippet not found"
+        )
+    content = _serialize_snippet(snippet)
+    _public_cache_set(cache_key, version, content)
+    return _conditional_response(content, request)
 
 
-@app.get("/snippets/public/", response_model=List[SnippetResponse])
-async def get_public_snippets(
+# Snippet routes
+@app.get("/snippets/", response_model=List[SnippetResponse])
+def get_snippets(
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db),
-    skip: int = 0,
-    limit: int = 100,
+    skip: int = Query(0, ge=0, le=MAX_SKIP),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     language: Optional[str] = None,
     tag: Optional[List[str]] = Query(None),
+    is_public: Optional[bool] = None,
     created_after: Optional[str] = None,
     created_before: Optional[str] = None,
 ):
-    """Get all public snippets with optional filtering (no authentication required)."""
-    # This endpoint is intentionally public and doesn't require authentication
-    query = db.query(Snippet).filter(Snippet.is_public == True)
+    """Get all snippets for the current user with optional filtering.
+
+    Snippets are listed newest first.
+    """
+    query = _build_snippet_query(
+        Snippet.user_id == current_user.id,
+        language=language,
+        tag=tag,
+        is_public=is_public,
+        created_after=created_after,
+        created_before=created_before,
+        cursor=cursor,
+    )
+    snippets = db.scalars(query.offset(skip).limit(limit)).all()
+    return _json_response(_serialize_snippets(snippets), _next_cursor(snippets, limit))
 
-    # Apply filters
-    if language:
-        query = query.filter(Snippet.language == language)
 
-    if created_after:
-        try:
-            created_after_date = datetime.fromisoformat(
-                created_after.replace("Z", "+00:00")
-            )
-            query = query.filter(Snippet.created_at >= created_after_date)
-        except ValueError:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid created_after date format. Use ISO format (YYYY-MM-DDTHH:MM:SS)",
-            )
+# Declared before /snippets/{snippet_id} so "stream" isn't parsed as an ID
+@app.get("/snippets/stream")
+def stream_snippets(
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    language: Optional[str] = None,
+    tag: Optional[List[str]] = Query(None),
+    is_public: Optional[bool] = None,
+    created_after: Optional[str] = None,
+    created_before: Optional[str] = None,
+):
+    """Stream all of the current user's snippets as newline-delimited JSON."""
+    query = _build_snippet_query(
+        Snippet.user_id == current_user.id,
+        language=language,
+        tag=tag,
+        is_public=is_public,
+        created_after=created_after,
+        created_before=created_before,
+        cursor=None,
+    )
+    # Rows are fetched and serialized in batches as the response is sent,
+    # so memory stays flat however large the library is
+    return StreamingResponse(
+        _ndjson_lines(db.get_bind(), query), media_type="application/x-ndjson"
+    )
 
-    if created_before:
-        try:
-            created_before_date = datetime.fromisoformat(
-                created_before.replace("Z", "+00:00")
-            )
-            query = query.filter(Snippet.created_at <= created_before_date)
-        except ValueError:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid created_before date format. Use ISO format (YYYY-MM-DDTHH:MM:SS)",
-            )
 
-    # Apply multiple tag filters (many-to-many relationship)
-    if tag:
-        # For multiple tags, we need to ensure the snippet has ALL specified tags
-        for tag_name in tag:
-            normalized_tag = tag_name.lower()
-            # Use a subquery to find snippets that have this specific tag
-            subquery = (
-                db.query(Snippet.id)
-                .join(Snippet.tags)
-                .filter(Tag.name == normalized_tag)
-                .subquery()
-            )
-            query = query.filter(Snippet.id.in_(subquery))
+@app.get("/snippets/public/", response_model=List[SnippetResponse])
+def get_public_snippets(
+    db: Session = Depends(get_db),
+    skip: int = Query(0, ge=0, le=MAX_SKIP),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    language: Optional[str] = None,
+    tag: Optional[List[str]] = Query(None),
+    created_after: Optional[str] = None,
+    created_before: Optional[str] = None,
+):
+    """Get all public snippets with optional filtering (no authentication required).
 
-    # Apply pagination
-    snippets = query.offset(skip).limit(limit).all()
-    return snippets
+    Snippets are listed newest first.
+    """
+    # This endpoint is intentionally public and doesn't require authentication
+    return _list_public_snippets(
+        db,
+        skip=skip,
+        limit=limit,
+        cursor=cursor,
+        language=language,
+        tag=tag,
+        created_after=created_after,
+        created_before=created_before,
+    )
 
 
 @app.get("/snippets/public/{snippet_id}", response_model=SnippetResponse)
-async def get_public_snippet(
+def get_public_snippet(
     snippet_id: int,
+    request: Request,
     db: Session = Depends(get_db),
 ):
     """Get a specific public snippet by ID (no authentication required)."""
     # This endpoint is intentionally public and doesn't require authentication
-    snippet = (
-        db.query(Snippet)
-        .filter(Snippet.id == snippet_id, Snippet.is_public == True)
-        .first()
-    )
-    if not snippet:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Public snippet not found"
-        )
-    return snippet
+    return _get_public_snippet(db, snippet_id, request)
 
 
 # Alternative public endpoints without any authentication dependencies
 @app.get("/public/snippets/", response_model=List[SnippetResponse])
-async def get_all_public_snippets(
+def get_all_public_snippets(
     db: Session = Depends(get_db),
-    skip: int = 0,
-    limit: int = 100,
+    skip: int = Query(0, ge=0, le=MAX_SKIP),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     language: Optional[str] = None,
     tag: Optional[List[str]] = Query(None),
     created_after: Optional[str] = None,
     created_before: Optional[str] = None,
 ):
-    """Get all public snippets with optional filtering (completely public endpoint)."""
-    query = db.query(Snippet).filter(Snippet.is_public == True)
-
-    # Apply filters
-    if language:
-        query = query.filter(Snippet.language == language)
-
-    if created_after:
-        try:
-            created_after_date = datetime.fromisoformat(
-                created_after.replace("Z", "+00:00")
-            )
-            query = query.filter(Snippet.created_at >= created_after_date)
-        except ValueError:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid created_after date format. Use ISO format (YYYY-MM-DDTHH:MM:SS)",
-            )
-
-    if created_before:
-        try:
-            created_before_date = datetime.fromisoformat(
-                created_before.replace("Z", "+00:00")
-            )
-            query = query.filter(Snippet.created_at <= created_before_date)
-        except ValueError:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid created_before date format. Use ISO format (YYYY-MM-DDTHH:MM:SS)",
-            )
-
-    # Apply multiple tag filters (many-to-many relationship)
-    if tag:
-        # For multiple tags, we need to ensure the snippet has ALL specified tags
-        for tag_name in tag:
-            normalized_tag = tag_name.lower()
-            # Use a subquery to find snippets that have this specific tag
-            subquery = (
-                db.query(Snippet.id)
-                .join(Snippet.tags)
-                .filter(Tag.name == normalized_tag)
-                .subquery()
-            )
-            query = query.filter(Snippet.id.in_(subquery))
-
-    # Apply pagination
-    snippets = query.offset(skip).limit(limit).all()
-    return snippets
+    """Get all public snippets with optional filtering (completely public endpoint).
+
+    Snippets are listed newest first.
+    """
+    return _list_public_snippets(
+        db,
+        skip=skip,
+        limit=limit,
+        cursor=cursor,
+        language=language,
+        tag=tag,
+        created_after=created_after,
+        created_before=created_before,
+    )
 
 
 @app.get("/public/snippets/{snippet_id}", response_model=SnippetResponse)
-async def get_specific_public_snippet(
+def get_specific_public_snippet(
     snippet_id: int,
+    request: Request,
     db: Session = Depends(get_db),
 ):
     """Get a specific public snippet by ID (completely public endpoint)."""
-    snippet = (
-        db.query(Snippet)
-        .filter(Snippet.id == snippet_id, Snippet.is_public == True)
-        .first()
-    )
-    if not snippet:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Public snippet not found"
-        )
-    return snippet
+    return _get_public_snippet(db, snippet_id, request)
 
 
 @app.post(
     "/snippets/", response_model=SnippetResponse, status_code=status.HTTP_201_CREATED
 )
-async def create_snippet(
+def create_snippet(
     snippet_data: SnippetCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     """Create a new snippet for the current user."""
@@ -371,35 +577,29 @@ async def create_snippet(
 
     # Handle tags
     if snippet_data.tags:
-        for tag_name in snippet_data.tags:
-            # Normalize tag name to lowercase for case-insensitive handling
-            normalized_tag_name = tag_name.lower()
-            # Check if tag exists, create if not
-            tag = db.query(Tag).filter(Tag.name == normalized_tag_name).first()
-            if not tag:
-                tag = Tag(name=normalized_tag_name)
-                db.add(tag)
-                db.flush()  # Flush to get the tag ID
-            db_snippet.tags.append(tag)
+        db_snippet.tags = _get_or_create_tags(db, snippet_data.tags)
 
     db.add(db_snippet)
     db.commit()
     db.refresh(db_snippet)
+
+    if db_snippet.is_public:
+        _invalidate_public_cache(db_snippet.id)
     return db_snippet
 
 
 @app.get("/snippets/{snippet_id}", response_model=SnippetResponse)
-async def get_snippet(
+def get_snippet(
     snippet_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     """Get a specific snippet by ID (only if owned by current user)."""
-    snippet = (
-        db.query(Snippet)
-        .filter(Snippet.id == snippet_id, Snippet.user_id == current_user.id)
-        .first()
-    )
+    snippet = db.scalars(
+        select(Snippet).where(
+            Snippet.id == snippet_id, Snippet.user_id == current_user.id
+        )
+    ).first()
     if not snippet:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Snippet not found"
@@ -408,118 +608,127 @@ async def get_snippet(
 
 
 @app.put("/snippets/{snippet_id}", response_model=SnippetResponse)
-async def update_snippet(
+def update_snippet(
     snippet_id: int,
     snippet_data: SnippetUpdate,
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     """Update a snippet (only if owned by current user)."""
-    snippet = (
-        db.query(Snippet)
-        .filter(Snippet.id == snippet_id, Snippet.user_id == current_user.id)
-        .first()
-    )
+    owned = (Snippet.id == snippet_id, Snippet.user_id == current_user.id)
+
+    # Update fields if provided
+    update_data = snippet_data.model_dump(exclude_unset=True)
+    has_tags = "tags" in update_data
+    tags = update_data.pop("tags", None)
+
+    if update_data:
+        # Update the row and enforce ownership in a single round-trip
+        snippet = db.scalars(
+            update(Snippet).where(*owned).values(**update_data).returning(Snippet)
+        ).one_or_none()
+    else:
+        snippet = db.scalars(select(Snippet).where(*owned)).first()
     if not snippet:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Snippet not found"
         )
 
-    # Update fields if provided
-    update_data = snippet_data.dict(exclude_unset=True)
-    if "tags" in update_data:
-        tags = update_data.pop("tags")
-        # Clear existing tags
-        snippet.tags.clear()
-        # Add new tags
-        if tags:
-            for tag_name in tags:
-                # Normalize tag name to lowercase for case-insensitive handling
-                normalized_tag_name = tag_name.lower()
-                tag = db.query(Tag).filter(Tag.name == normalized_tag_name).first()
-                if not tag:
-                    tag = Tag(name=normalized_tag_name)
-                    db.add(tag)
-                    db.flush()
-                snippet.tags.append(tag)
-
-    for field, value in update_data.items():
-        setattr(snippet, field, value)
+    if has_tags:
+        # Replace existing tags
+        snippet.tags = _get_or_create_tags(db, tags) if tags else []
 
+    # Read everything before committing so the response doesn't reload the row
+    content = _serialize_snippet(snippet)
+    was_public = snippet.is_public
     db.commit()
-    db.refresh(snippet)
-    return snippet
+
+    if was_public or "is_public" in update_data:
+        _invalidate_public_cache(snippet_id)
+    return _json_response(content)
 
 
 @app.patch("/snippets/{snippet_id}/toggle-public", response_model=SnippetResponse)
-async def toggle_snippet_public(
+def toggle_snippet_public(
     snippet_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     """Toggle the public status of a snippet (only if owned by current user)."""
-    snippet = (
-        db.query(Snippet)
-        .filter(Snippet.id == snippet_id, Snippet.user_id == current_user.id)
-        .first()
-    )
+    # Toggle the is_public field and enforce ownership in a single round-trip
+    snippet = db.scalars(
+        update(Snippet)
+        .where(Snippet.id == snippet_id, Snippet.user_id == current_user.id)
+        .values(is_public=not_(Snippet.is_public))
+        .returning(Snippet)
+    ).one_or_none()
     if not snippet:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Snippet not found"
         )
 
-    # Toggle the is_public field
-    snippet.is_public = not snippet.is_public
+    # Serialize before committing so the response doesn't reload the row
+    content = _serialize_snippet(snippet)
     db.commit()
-    db.refresh(snippet)
-    return snippet
+
+    _invalidate_public_cache(snippet_id)
+    return _json_response(content)
 
 
 @app.delete("/snippets/{snippet_id}")
-async def delete_snippet(
+def delete_snippet(
     snippet_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     """Delete a snippet (only if owned by current user)."""
-    snippet = (
-        db.query(Snippet)
-        .filter(Snippet.id == snippet_id, Snippet.user_id == current_user.id)
-        .first()
+    owned = (Snippet.id == snippet_id, Snippet.user_id == current_user.id)
+
+    # snippet_tags rows don't cascade, so remove the snippet's associations first
+    db.execute(
+        delete(snippet_tags).where(
+            snippet_tags.c.snippet_id.in_(select(Snippet.id).where(*owned))
+        )
     )
-    if not snippet:
+    deleted = db.execute(
+        delete(Snippet).where(*owned).returning(Snippet.is_public)
+    ).first()
+    if not deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Snippet not found"
         )
-
-    db.delete(snippet)
     db.commit()
+
+    if deleted.is_public:
+        _invalidate_public_cache(snippet_id)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
 # Tag routes
 @app.get("/tags/", response_model=List[TagResponse])
-async def get_tags(
+def get_tags(
     db: Session = Depends(get_db),
-    skip: int = 0,
-    limit: int = 100,
+    skip: int = Query(0, ge=0, le=MAX_SKIP),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
 ):
     """Get all tags in the system (no authentication required)."""
-    tags = db.query(Tag).offset(skip).limit(limit).all()
+    tags = db.scalars(select(Tag).offset(skip).limit(limit)).all()
     return tags
 
 
 @app.post("/tags/", response_model=TagResponse, status_code=status.HTTP_201_CREATED)
-async def create_tag(
+def create_tag(
     tag_data: TagCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     """Create a new tag."""
     # Normalize tag name to lowercase for case-insensitive handling
     normalized_tag_name = tag_data.name.lower()
     # Check if tag already exists
-    existing_tag = db.query(Tag).filter(Tag.name == normalized_tag_name).first()
+    existing_tag = db.scalars(
+        select(Tag).where(Tag.name == normalized_tag_name)
+    ).first()
     if existing_tag:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Tag already exists"
@@ -533,6 +742,17 @@ async def create_tag(
 
 
 if __name__ == "__main__":
+    import os
     import uvicorn
 
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # One worker per core; each worker has its own DB pool (see database.py)
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1))),
+        log_level="warning",
+        access_log=False,
+    )
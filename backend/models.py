@@ -6,10 +6,11 @@ from sqlalchemy import (
     Boolean,
     DateTime,
     ForeignKey,
+    Index,
     Table,
 )
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from database import Base
 
 # Association table for many-to-many relationship between snippets and tags
@@ -18,6 +19,8 @@ snippet_tags = Table(
     Base.metadata,
     Column("snippet_id", Integer, ForeignKey("snippets.id"), primary_key=True),
     Column("tag_id", Integer, ForeignKey("tags.id"), primary_key=True),
+    # The primary key leads with snippet_id; this serves tag -> snippets lookups
+    Index("ix_snippet_tags_tag_id_snippet_id", "tag_id", "snippet_id"),
 )
 
 
@@ -49,9 +52,34 @@ class Snippet(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    __table_args__ = (
+        # Serves a user's snippet list, newest first
+        Index("ix_snippets_user_id_id", "user_id", "id"),
+        # Serve the created_after/created_before list filters
+        Index("ix_snippets_user_id_created_at", "user_id", "created_at"),
+        Index(
+            "ix_snippets_public_created_at",
+            "is_public",
+            "created_at",
+            postgresql_where=text("is_public"),  # Only public rows are indexed
+            sqlite_where=text("is_public"),
+        ),
+        # Serves the public list filtered by language, newest first
+        Index(
+            "ix_snippets_public_language_id",
+            "language",
+            "id",
+            postgresql_where=text("is_public"),
+            sqlite_where=text("is_public"),
+        ),
+    )
+
     # Relationships
     user = relationship("User", back_populates="snippets")
-    tags = relationship("Tag", secondary=snippet_tags, back_populates="snippets")
+    # Loaded with one IN query per batch of snippets; every response embeds them
+    tags = relationship(
+        "Tag", secondary=snippet_tags, back_populates="snippets", lazy="selectin"
+    )
 
 
 class Tag(Base):
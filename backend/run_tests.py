@@ -3,10 +3,13 @@
 Test runner script for SnipVault backend tests
 """
 
-import subprocess
 import sys
 import os
 
+import pytest
+
+PYTEST_ARGS = ["-v", "--tb=short", "--disable-warnings"]
+
 
 def run_tests():
     """Run all tests with pytest"""
@@ -16,20 +19,9 @@ def run_tests():
     # Change to backend directory
     os.chdir(os.path.dirname(os.path.abspath(__file__)))
 
-    # Run pytest with verbose output
-    cmd = [
-        sys.executable,
-        "-m",
-        "pytest",
-        "tests/",
-        "-v",
-        "--tb=short",
-        "--disable-warnings",
-    ]
-
+    # Run pytest in-process with verbose output
     try:
-        result = subprocess.run(cmd, capture_output=False)
-        return result.returncode
+        return int(pytest.main(["tests/", *PYTEST_ARGS]))
     except Exception as e:
         print(f"❌ Error running tests: {e}")
         return 1
@@ -42,19 +34,8 @@ def run_specific_test(test_file):
 
     os.chdir(os.path.dirname(os.path.abspath(__file__)))
 
-    cmd = [
-        sys.executable,
-        "-m",
-        "pytest",
-        f"tests/{test_file}",
-        "-v",
-        "--tb=short",
-        "--disable-warnings",
-    ]
-
     try:
-        result = subprocess.run(cmd, capture_output=False)
-        return result.returncode
+        return int(pytest.main([f"tests/{test_file}", *PYTEST_ARGS]))
     except Exception as e:
         print(f"❌ Error running test: {e}")
         return 1
@@ -1,7 +1,28 @@
-from pydantic import BaseModel, EmailStr, Field, validator
-from typing import Optional, List
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, StringConstraints
+from typing import Annotated, Optional, List
 from datetime import datetime
 
+__all__ = [
+    "StrippedStr",
+    "UserBase",
+    "UserCreate",
+    "UserResponse",
+    "CurrentUser",
+    "UserLogin",
+    "Token",
+    "TokenData",
+    "TagBase",
+    "TagCreate",
+    "TagResponse",
+    "SnippetBase",
+    "SnippetCreate",
+    "SnippetUpdate",
+    "SnippetResponse",
+]
+
+# Non-empty string with surrounding whitespace removed (checked by pydantic-core)
+StrippedStr = Annotated[str, StringConstraints(strip_whitespace=True, min_length=1)]
+
 
 # User schemas
 class UserBase(BaseModel):
@@ -19,8 +40,13 @@ class UserResponse(UserBase):
     created_at: datetime
     updated_at: Optional[datetime] = None
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
+
+
+# The user resolved by get_current_user. It is built the same way from a
+# database row or from the token cache, so handlers never get an ORM object
+class CurrentUser(UserResponse):
+    pass
 
 
 # Authentication schemas
@@ -40,15 +66,7 @@ class TokenData(BaseModel):
 
 # Tag schemas
 class TagBase(BaseModel):
-    name: str = Field(..., min_length=1, max_length=50, description="Tag name")
-
-    @validator("name")
-    def validate_name(cls, v):
-        if not v or not v.strip():
-            raise ValueError("Tag name cannot be empty")
-        if len(v.strip()) > 50:
-            raise ValueError("Tag name cannot exceed 50 characters")
-        return v.strip()
+    name: StrippedStr = Field(..., max_length=50, description="Tag name")
 
 
 class TagCreate(TagBase):
@@ -59,40 +77,21 @@ class TagResponse(TagBase):
     id: int
     created_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # Snippet schemas
 class SnippetBase(BaseModel):
-    title: str = Field(..., min_length=1, max_length=200, description="Snippet title")
-    code: str = Field(..., min_length=1, description="Snippet code")
-    language: str = Field(
-        ..., min_length=1, max_length=50, description="Programming language"
+    title: StrippedStr = Field(..., max_length=200, description="Snippet title")
+    code: StrippedStr = Field(..., description="Snippet code")
+    language: StrippedStr = Field(
+        ..., max_length=50, description="Programming language"
     )
     description: Optional[str] = Field(
         None, max_length=1000, description="Snippet description"
     )
     is_public: bool = False
 
-    @validator("title")
-    def validate_title(cls, v):
-        if not v or not v.strip():
-            raise ValueError("Title cannot be empty")
-        return v.strip()
-
-    @validator("code")
-    def validate_code(cls, v):
-        if not v or not v.strip():
-            raise ValueError("Code cannot be empty")
-        return v.strip()
-
-    @validator("language")
-    def validate_language(cls, v):
-        if not v or not v.strip():
-            raise ValueError("Language cannot be empty")
-        return v.strip()
-
 
 class SnippetCreate(SnippetBase):
     tags: Optional[List[str]] = []
@@ -114,5 +113,4 @@ class SnippetResponse(SnippetBase):
     updated_at: Optional[datetime] = None
     tags: List[TagResponse] = []
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
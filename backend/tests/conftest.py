@@ -1,83 +1,185 @@
+import os
+
+# Pin the token settings before the app modules read them, so a local .env
+# can't switch the suite to a slower or different signing algorithm.
+os.environ["ALGORITHM"] = "HS256"
+os.environ["SECRET_KEY"] = "test-secret-key"
+# Keep a configured Redis out of the suite: cached bodies would outlive each
+# test's rolled-back rows. Tests opt in to caching with fake_cache.
+os.environ["REDIS_URL"] = ""
+
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import QueuePool
 
+import cache
 from main import app
 from database import get_db, Base
 from models import User, Snippet, Tag
 from auth import create_access_token, get_password_hash
 
-# Create in-memory SQLite database for testing
-SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+# Create a shared-cache in-memory SQLite database for testing, so pooled
+# connections each get their own handle on the same database. Each
+# pytest-xdist worker gets its own database.
+WORKER_ID = os.environ.get("PYTEST_XDIST_WORKER", "master")
+SQLALCHEMY_DATABASE_URL = (
+    f"sqlite:///file:snipvault_test_{WORKER_ID}?mode=memory&cache=shared&uri=true"
+)
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
     connect_args={"check_same_thread": False},
-    poolclass=StaticPool,
+    poolclass=QueuePool,
+    # Unlike the app engine, skip the liveness ping on checkout: an in-memory
+    # database can't drop a connection out from under the pool
+    pool_pre_ping=False,
+    echo=False,
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-# Create tables
-Base.metadata.create_all(bind=engine)
 
+@event.listens_for(engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Tune each new connection to the shared test database"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA temp_store = MEMORY")
+    cursor.close()
+    # Let SQLAlchemy emit BEGIN itself so SAVEPOINTs work under pysqlite
+    dbapi_connection.isolation_level = None
 
-def override_get_db():
-    """Override the database dependency for testing"""
-    try:
-        db = TestingSessionLocal()
-        yield db
-    finally:
-        db.close()
 
+@event.listens_for(engine, "begin")
+def begin_sqlite_transaction(connection):
+    """Start transactions explicitly (pysqlite defers them otherwise)"""
+    connection.exec_driver_sql("BEGIN")
 
-# Override the database dependency
-app.dependency_overrides[get_db] = override_get_db
 
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    """Create the tables once for the whole test session"""
+    # The in-memory database only lives while a connection to it is open
+    with engine.connect() as connection:
+        # The database always starts empty, so skip the per-table existence checks
+        Base.metadata.create_all(bind=connection, checkfirst=False)
+        connection.commit()
+        yield
 
-@pytest.fixture
+
+# Password hashing is deliberately slow, so test users share one hash
+TEST_PASSWORD = "testpassword123"
+TEST_PASSWORD_HASH = get_password_hash(TEST_PASSWORD)
+
+
+@pytest.fixture(scope="session")
+def test_password():
+    """Plain-text password of the test users"""
+    return TEST_PASSWORD
+
+
+@pytest.fixture(scope="session")
+def test_password_hash():
+    """Hash of the test users' password (computed once per test session)"""
+    return TEST_PASSWORD_HASH
+
+
+def session_for(connection):
+    """Create a session whose commits only release a SAVEPOINT on connection"""
+    return TestingSessionLocal(
+        bind=connection, join_transaction_mode="create_savepoint"
+    )
+
+
+@pytest.fixture(autouse=True)
+def connection(database):
+    """Run each test in a transaction that is rolled back afterwards"""
+    connection = engine.connect()
+    transaction = connection.begin()
+
+    def override_get_db():
+        """Override the database dependency for testing"""
+        db = session_for(connection)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    # Override the database dependency
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        yield connection
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        transaction.rollback()
+        connection.close()
+
+
+@pytest.fixture(scope="session")
 def client():
-    """Test client fixture"""
-    return TestClient(app)
+    """Test client fixture (the app starts up once per test session)"""
+    with TestClient(app) as test_client:
+        yield test_client
 
 
 @pytest.fixture
-def db_session():
+def db_session(connection):
     """Database session fixture"""
-    db = TestingSessionLocal()
+    db = session_for(connection)
     try:
         yield db
     finally:
-        db.rollback()
         db.close()
 
 
-@pytest.fixture
-def test_user(db_session):
-    """Create a test user"""
-    # Check if user already exists
-    existing_user = db_session.query(User).filter(User.username == "testuser").first()
-    if existing_user:
-        return existing_user
-
-    user = User(
-        username="testuser",
-        email="test@example.com",
-        hashed_password=get_password_hash("testpassword123"),
+def _create_committed(obj):
+    """Commit obj outside the per-test transactions, so it outlives them"""
+    db = TestingSessionLocal()
+    try:
+        db.add(obj)
+        db.commit()
+        db.refresh(obj)
+        return obj
+    finally:
+        db.close()
+
+
+@pytest.fixture(scope="session")
+def test_user(database):
+    """Create a test user (once per test session)"""
+    return _create_committed(
+        User(
+            username="testuser",
+            email="test@example.com",
+            hashed_password=TEST_PASSWORD_HASH,
+        )
     )
-    db_session.add(user)
-    db_session.commit()
-    db_session.refresh(user)
-    return user
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
+def other_user(database):
+    """Create a second user, for ownership tests (once per test session)"""
+    return _create_committed(
+        User(
+            username="otheruser",
+            email="other@example.com",
+            hashed_password=TEST_PASSWORD_HASH,
+        )
+    )
+
+
+@pytest.fixture(scope="session")
 def test_user_token(test_user):
     """Create a JWT token for the test user"""
     return create_access_token(data={"sub": test_user.username})
 
 
+@pytest.fixture(scope="class")
+def auth_headers(test_user_token):
+    """Authorization headers for the test user"""
+    return {"Authorization": f"Bearer {test_user_token}"}
+
+
 @pytest.fixture
 def test_snippet(db_session, test_user):
     """Create a test snippet"""
@@ -113,15 +215,68 @@ def test_public_snippet(db_session, test_user):
 
 
 @pytest.fixture
-def test_tag(db_session):
-    """Create a test tag"""
-    # Check if tag already exists
-    existing_tag = db_session.query(Tag).filter(Tag.name == "python").first()
-    if existing_tag:
-        return existing_tag
-
-    tag = Tag(name="python")
-    db_session.add(tag)
+def other_user_snippet(db_session, other_user):
+    """Create a snippet owned by the other user"""
+    snippet = Snippet(
+        title="Other User's Snippet",
+        code="print('Other user code')",
+        language="python",
+        user_id=other_user.id,
+    )
+    db_session.add(snippet)
     db_session.commit()
-    db_session.refresh(tag)
-    return tag
+    db_session.refresh(snippet)
+    return snippet
+
+
+@pytest.fixture(scope="session")
+def test_tag(database):
+    """Create a test tag (once per test session)"""
+    return _create_committed(Tag(name="python"))
+
+
+class FakeRedis:
+    """Minimal in-memory stand-in for the Redis client used by cache.py"""
+
+    def __init__(self):
+        self.store = {}
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def mget(self, keys):
+        return [self.store.get(key) for key in keys]
+
+    def setex(self, key, ttl, value):
+        self.store[key] = value
+
+    def delete(self, *keys):
+        for key in keys:
+            self.store.pop(key, None)
+
+    def incr(self, key):
+        self.store[key] = str(int(self.store.get(key, b"0")) + 1).encode()
+
+
+@pytest.fixture
+def fake_cache(monkeypatch):
+    """Enable response caching against an in-memory fake Redis"""
+    fake = FakeRedis()
+    monkeypatch.setattr(cache, "cache_client", fake)
+    monkeypatch.setattr(cache, "_unavailable_until", 0.0)
+    return fake
+
+
+@pytest.fixture
+def sql_statements():
+    """Record the SQL statements executed while the fixture is active"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        # Ignore the SAVEPOINTs that isolate each test's sessions
+        if "SAVEPOINT" not in statement:
+            statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(engine, "before_cursor_execute", record)
@@ -1,9 +1,14 @@
+from unittest.mock import patch
+
 import pytest
 from fastapi import status
-from sqlalchemy.orm import Session
+from fastapi.security import HTTPAuthorizationCredentials
+from passlib.exc import UnknownHashError
+from passlib.hash import bcrypt
 
 from models import User
-from auth import verify_password, get_password_hash
+from auth import create_access_token, get_current_user, pwd_context, verify_password
+from schemas import CurrentUser
 
 
 class TestAuth:
@@ -40,7 +45,8 @@ class TestAuth:
         )
 
         assert response.status_code == status.HTTP_400_BAD_REQUEST
-        assert "already registered" in response.json()["detail"]
+        data = response.json()
+        assert "already registered" in data["detail"]
 
     def test_signup_duplicate_email(self, client, test_user):
         """Test signup with existing email"""
@@ -54,7 +60,8 @@ class TestAuth:
         )
 
         assert response.status_code == status.HTTP_400_BAD_REQUEST
-        assert "already registered" in response.json()["detail"]
+        data = response.json()
+        assert "already registered" in data["detail"]
 
     def test_signup_invalid_data(self, client):
         """Test signup with invalid data"""
@@ -103,10 +110,9 @@ class TestAuth:
         assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
         # The endpoint might return 422 for validation errors
 
-    def test_get_current_user_success(self, client, test_user_token):
+    def test_get_current_user_success(self, client, auth_headers):
         """Test getting current user with valid token"""
-        headers = {"Authorization": f"Bearer {test_user_token}"}
-        response = client.get("/users/me", headers=headers)
+        response = client.get("/users/me", headers=auth_headers)
 
         assert response.status_code == status.HTTP_200_OK
         data = response.json()
@@ -127,27 +133,105 @@ class TestAuth:
 
         assert response.status_code == status.HTTP_403_FORBIDDEN
 
-    def test_password_hashing(self):
+    def test_get_current_user_cached(self, client, fake_cache, sql_statements):
+        """Test that the token's user is served from the cache"""
+        client.post(
+            "/auth/signup",
+            json={
+                "username": "cacheduser",
+                "email": "cacheduser@example.com",
+                "password": "securepassword123",
+            },
+        )
+        response = client.post(
+            "/auth/login",
+            json={"username": "cacheduser", "password": "securepassword123"},
+        )
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        response = client.get("/users/me", headers=headers)
+        assert response.status_code == status.HTTP_200_OK
+        assert any(key.startswith("u:") for key in fake_cache.store)
+
+        # A cache hit skips the user lookup entirely
+        sql_statements.clear()
+        response = client.get("/users/me", headers=headers)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["username"] == "cacheduser"
+        assert not any("FROM users" in statement for statement in sql_statements)
+
+    def test_get_current_user_same_type_when_cached(
+        self, db_session, fake_cache, test_user, test_user_token
+    ):
+        """Test that database and cache lookups return the same user type"""
+        credentials = HTTPAuthorizationCredentials(
+            scheme="Bearer", credentials=test_user_token
+        )
+
+        from_db = get_current_user(credentials, db_session)
+        from_cache = get_current_user(credentials, db_session)
+
+        assert type(from_db) is CurrentUser
+        assert type(from_cache) is CurrentUser
+        assert from_cache == from_db
+        assert from_db.id == test_user.id
+
+    def test_password_hashing(self, test_password, test_password_hash):
         """Test password hashing and verification"""
-        password = "testpassword123"
-        hashed = get_password_hash(password)
+        password = test_password
+        hashed = test_password_hash
+        assert hashed.startswith("$argon2id$")
 
         # Verify the password
         assert verify_password(password, hashed)
         assert not verify_password("wrongpassword", hashed)
 
         # Test with invalid hash - should raise an exception
-        import pytest
-        from passlib.exc import UnknownHashError
-
         with pytest.raises(UnknownHashError):
             verify_password(password, "wronghash")
 
+    def test_login_upgrades_bcrypt_hash(self, client, db_session):
+        """Test that a legacy bcrypt hash is rehashed with argon2 on login"""
+        user = User(
+            username="bcryptuser",
+            email="bcryptuser@example.com",
+            hashed_password=bcrypt.hash("securepassword123"),
+        )
+        db_session.add(user)
+        db_session.commit()
+
+        response = client.post(
+            "/auth/login",
+            json={"username": "bcryptuser", "password": "securepassword123"},
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+        db_session.refresh(user)
+        assert user.hashed_password.startswith("$argon2id$")
+        assert verify_password("securepassword123", user.hashed_password)
+
+    def test_login_verification_cache(self, client, test_user):
+        """Test that repeat logins skip the KDF but wrong passwords still fail"""
+        credentials = {"username": "testuser", "password": "testpassword123"}
+        response = client.post("/auth/login", json=credentials)
+        assert response.status_code == status.HTTP_200_OK
+
+        with patch.object(
+            pwd_context, "verify_and_update", wraps=pwd_context.verify_and_update
+        ) as verify:
+            response = client.post("/auth/login", json=credentials)
+            assert response.status_code == status.HTTP_200_OK
+            assert verify.call_count == 0
+
+            response = client.post(
+                "/auth/login",
+                json={"username": "testuser", "password": "wrongpassword"},
+            )
+            assert response.status_code == status.HTTP_401_UNAUTHORIZED
+            assert verify.call_count == 1
+
     def test_token_creation_and_validation(self, test_user):
         """Test JWT token creation and validation"""
-        from auth import create_access_token, get_current_user
-        from database import get_db
-
         # Create token
         token = create_access_token(data={"sub": test_user.username})
         assert token is not None
@@ -1,17 +1,38 @@
-import pytest
+from datetime import datetime, timedelta
+
+import redis
 from fastapi import status
-from sqlalchemy.orm import Session
+from sqlalchemy import insert
 
-from models import Snippet, User
-from auth import get_password_hash
+import cache
+from models import Snippet, Tag
 
 
 class TestPublicSharing:
     """Test public snippet sharing functionality"""
 
-    def test_get_public_snippets(self, client, test_public_snippet):
+    def test_get_public_snippets(
+        self, client, db_session, test_user, test_public_snippet, sql_statements
+    ):
         """Test getting all public snippets"""
+        # Two tagged public snippets, so a per-snippet tag query would show up
+        test_public_snippet.tags = [Tag(name="listtag")]
+        db_session.add(
+            Snippet(
+                title="Second Public Snippet",
+                code="console.log('second')",
+                language="javascript",
+                is_public=True,
+                user_id=test_user.id,
+                tags=[Tag(name="secondtag")],
+            )
+        )
+        db_session.commit()
+        sql_statements.clear()
+
         response = client.get("/public/snippets/")
+        # One query for the page, one for its tags, however many snippets
+        assert len(sql_statements) <= 2
 
         assert response.status_code == status.HTTP_200_OK
         data = response.json()
@@ -19,17 +40,13 @@ class TestPublicSharing:
         assert len(data) >= 1
 
         # Check that we get the public snippet
-        snippet_found = False
-        for snippet in data:
-            if snippet["id"] == test_public_snippet.id:
-                snippet_found = True
-                assert snippet["title"] == "Public Test Snippet"
-                assert snippet["code"] == "console.log('Hello, World!')"
-                assert snippet["language"] == "javascript"
-                assert snippet["is_public"] == True
-                break
-
-        assert snippet_found
+        snippets = {snippet["id"]: snippet for snippet in data}
+        assert test_public_snippet.id in snippets
+        snippet = snippets[test_public_snippet.id]
+        assert snippet["title"] == "Public Test Snippet"
+        assert snippet["code"] == "console.log('Hello, World!')"
+        assert snippet["language"] == "javascript"
+        assert snippet["is_public"] == True
 
     def test_get_public_snippet_by_id(self, client, test_public_snippet):
         """Test getting a specific public snippet by ID"""
@@ -43,6 +60,76 @@ class TestPublicSharing:
         assert data["language"] == "javascript"
         assert data["is_public"] == True
 
+    def test_public_snippet_etag(self, client, test_public_snippet):
+        """Test conditional requests against a public snippet's ETag"""
+        url = f"/public/snippets/{test_public_snippet.id}"
+        response = client.get(url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert "public" in response.headers["Cache-Control"]
+        etag = response.headers["ETag"]
+
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response.content == b""
+        assert response.headers["ETag"] == etag
+
+        # If-None-Match uses weak comparison, and "*" matches any current tag
+        assert etag.startswith('W/"')
+        strong_etag = etag.removeprefix("W/")
+        for if_none_match in (strong_etag, f'"stale", {etag}', "*"):
+            response = client.get(url, headers={"If-None-Match": if_none_match})
+            assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+        response = client.get(url, headers={"If-None-Match": '"stale"'})
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_public_snippet_etag_compressed(self, client, db_session, test_user):
+        """Test that compressed and identity responses share only a weak ETag"""
+        snippet = Snippet(
+            title="Large Public Snippet",
+            code="console.log('hello world');\n" * 200,
+            language="javascript",
+            is_public=True,
+            user_id=test_user.id,
+        )
+        db_session.add(snippet)
+        db_session.commit()
+        url = f"/public/snippets/{snippet.id}"
+
+        compressed = client.get(url, headers={"Accept-Encoding": "gzip"})
+        identity = client.get(url, headers={"Accept-Encoding": "identity"})
+        assert compressed.headers["Content-Encoding"] == "gzip"
+        assert "Content-Encoding" not in identity.headers
+        assert compressed.headers["ETag"].startswith('W/"')
+        assert compressed.headers["ETag"] == identity.headers["ETag"]
+
+        response = client.get(
+            url,
+            headers={
+                "Accept-Encoding": "gzip",
+                "If-None-Match": compressed.headers["ETag"],
+            },
+        )
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_public_snippet_etag_changes_on_update(
+        self, client, test_public_snippet, auth_headers
+    ):
+        """Test that updating a public snippet changes its ETag"""
+        url = f"/public/snippets/{test_public_snippet.id}"
+        etag = client.get(url).headers["ETag"]
+
+        client.put(
+            f"/snippets/{test_public_snippet.id}",
+            json={"title": "Retitled Public Snippet"},
+            headers=auth_headers,
+        )
+
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["ETag"] != etag
+
     def test_get_private_snippet_publicly_fails(self, client, test_snippet):
         """Test that private snippets cannot be accessed publicly"""
         response = client.get(f"/public/snippets/{test_snippet.id}")
@@ -73,8 +160,6 @@ class TestPublicSharing:
     ):
         """Test filtering public snippets by tag"""
         # Add a tag to the public snippet
-        from models import Tag
-
         tag = Tag(name="javascript")
         db_session.add(tag)
         db_session.commit()
@@ -89,20 +174,21 @@ class TestPublicSharing:
 
     def test_public_snippets_pagination(self, client, db_session, test_user):
         """Test pagination for public snippets"""
-        # Create multiple public snippets
-        snippets = []
-        for i in range(15):
-            snippet = Snippet(
-                title=f"Public Snippet {i}",
-                code=f"console.log('Snippet {i}')",
-                language="javascript",
-                description=f"Description {i}",
-                is_public=True,
-                user_id=test_user.id,
-            )
-            db_session.add(snippet)
-            snippets.append(snippet)
-
+        # Create multiple public snippets in a single executemany
+        db_session.execute(
+            insert(Snippet),
+            [
+                {
+                    "title": f"Public Snippet {i}",
+                    "code": f"console.log('Snippet {i}')",
+                    "language": "javascript",
+                    "description": f"Description {i}",
+                    "is_public": True,
+                    "user_id": test_user.id,
+                }
+                for i in range(15)
+            ],
+        )
         db_session.commit()
 
         # Test with limit
@@ -119,35 +205,32 @@ class TestPublicSharing:
 
     def test_public_snippets_date_filtering(self, client, db_session, test_user):
         """Test date filtering for public snippets"""
-        from datetime import datetime, timedelta
-
         # Create snippets with different dates
         today = datetime.utcnow()
         yesterday = today - timedelta(days=1)
-        last_week = today - timedelta(days=7)
-
-        # Create a snippet from yesterday
-        old_snippet = Snippet(
-            title="Old Public Snippet",
-            code="console.log('Old')",
-            language="javascript",
-            is_public=True,
-            user_id=test_user.id,
-            created_at=yesterday,
-        )
-        db_session.add(old_snippet)
 
-        # Create a snippet from today
-        new_snippet = Snippet(
-            title="New Public Snippet",
-            code="console.log('New')",
-            language="javascript",
-            is_public=True,
-            user_id=test_user.id,
-            created_at=today,
+        # Create a snippet from yesterday and one from today
+        db_session.execute(
+            insert(Snippet),
+            [
+                {
+                    "title": "Old Public Snippet",
+                    "code": "console.log('Old')",
+                    "language": "javascript",
+                    "is_public": True,
+                    "user_id": test_user.id,
+                    "created_at": yesterday,
+                },
+                {
+                    "title": "New Public Snippet",
+                    "code": "console.log('New')",
+                    "language": "javascript",
+                    "is_public": True,
+                    "user_id": test_user.id,
+                    "created_at": today,
+                },
+            ],
         )
-        db_session.add(new_snippet)
-
         db_session.commit()
 
         # Test filtering by created_after
@@ -158,6 +241,16 @@ class TestPublicSharing:
         data = response.json()
         assert len(data) >= 1
 
+    def test_public_snippets_date_filter_formats(self, client):
+        """Test that UTC 'Z' dates are accepted and malformed dates rejected"""
+        response = client.get("/public/snippets/?created_before=2100-01-01T00:00:00Z")
+        assert response.status_code == status.HTTP_200_OK
+
+        response = client.get("/public/snippets/?created_after=yesterday")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        data = response.json()
+        assert "created_after" in data["detail"]
+
     def test_public_snippets_no_authentication_required(
         self, client, test_public_snippet
     ):
@@ -169,18 +262,31 @@ class TestPublicSharing:
         response = client.get(f"/public/snippets/{test_public_snippet.id}")
         assert response.status_code == status.HTTP_200_OK
 
-    def test_mixed_public_private_snippets(self, client, db_session, test_user):
+    def test_mixed_public_private_snippets(
+        self, client, db_session, test_user, sql_statements
+    ):
         """Test that only public snippets are returned in public endpoints"""
-        # Create both public and private snippets
+        # Create tagged public snippets and a private one
         public_snippet = Snippet(
             title="Public Snippet",
             code="console.log('public')",
             language="javascript",
             is_public=True,
             user_id=test_user.id,
+            tags=[Tag(name="publictag")],
         )
         db_session.add(public_snippet)
 
+        other_public_snippet = Snippet(
+            title="Other Public Snippet",
+            code="console.log('other public')",
+            language="javascript",
+            is_public=True,
+            user_id=test_user.id,
+            tags=[Tag(name="otherpublictag")],
+        )
+        db_session.add(other_public_snippet)
+
         private_snippet = Snippet(
             title="Private Snippet",
             code="console.log('private')",
@@ -193,12 +299,14 @@ class TestPublicSharing:
         db_session.commit()
 
         # Check public endpoint only returns public snippets
+        sql_statements.clear()
         response = client.get("/public/snippets/")
         assert response.status_code == status.HTTP_200_OK
+        assert len(sql_statements) <= 2
         data = response.json()
 
-        public_ids = [snippet["id"] for snippet in data]
-        assert public_snippet.id in public_ids
+        public_ids = {snippet["id"] for snippet in data}
+        assert {public_snippet.id, other_public_snippet.id} <= public_ids
         assert private_snippet.id not in public_ids
 
     def test_public_snippet_user_info(self, client, test_public_snippet):
@@ -212,3 +320,165 @@ class TestPublicSharing:
         assert "user_id" in data
         # But should not include sensitive user data
         assert "hashed_password" not in data
+
+    def test_public_snippet_is_cached(
+        self, client, db_session, fake_cache, test_public_snippet, auth_headers
+    ):
+        """Test that public snippet lookups are served from the cache"""
+        url = f"/public/snippets/{test_public_snippet.id}"
+        response = client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["title"] == "Public Test Snippet"
+
+        # Change the row behind the cache's back
+        test_public_snippet.title = "Changed Directly"
+        db_session.commit()
+
+        response = client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["title"] == "Public Test Snippet"
+
+        # Making the snippet private through the API invalidates the cache
+        response = client.patch(
+            f"/snippets/{test_public_snippet.id}/toggle-public", headers=auth_headers
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+        response = client.get(url)
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_public_snippet_cache_ignores_late_writes(
+        self, client, fake_cache, test_public_snippet, auth_headers
+    ):
+        """Test that a response cached after invalidation is never served"""
+        url = f"/public/snippets/{test_public_snippet.id}"
+        assert client.get(url).status_code == status.HTTP_200_OK
+        stale_entries = {
+            key: value
+            for key, value in fake_cache.store.items()
+            if key.startswith("pub:snippet:")
+        }
+        assert stale_entries
+
+        response = client.patch(
+            f"/snippets/{test_public_snippet.id}/toggle-public", headers=auth_headers
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+        # A reader that fetched the row before the toggle writes it back late
+        for key, value in stale_entries.items():
+            fake_cache.setex(key, 300, value)
+
+        response = client.get(url)
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_public_snippet_cache_hit_is_one_round_trip(
+        self, client, fake_cache, test_public_snippet, monkeypatch
+    ):
+        """Test that a cache hit reads the version and entry in one call"""
+        url = f"/public/snippets/{test_public_snippet.id}"
+        client.get(url)
+
+        calls = []
+        mget = fake_cache.mget
+        monkeypatch.setattr(fake_cache, "get", lambda key: calls.append(key))
+        monkeypatch.setattr(
+            fake_cache, "mget", lambda keys: calls.append(keys) or mget(keys)
+        )
+        response = client.get(url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(calls) == 1
+
+    def test_public_snippets_skip_failing_cache(
+        self, client, fake_cache, test_public_snippet, monkeypatch
+    ):
+        """Test that a Redis failure skips the cache for later requests"""
+        calls = []
+
+        def failing_mget(keys):
+            calls.append(keys)
+            raise redis.ConnectionError("Redis is down")
+
+        monkeypatch.setattr(fake_cache, "mget", failing_mget)
+        url = f"/public/snippets/{test_public_snippet.id}"
+        for _ in range(2):
+            response = client.get(url)
+            assert response.status_code == status.HTTP_200_OK
+
+        assert len(calls) == 1
+        assert not fake_cache.store
+
+    def test_public_snippet_invalidated_while_cache_skipped(
+        self, client, fake_cache, test_public_snippet, auth_headers, monkeypatch
+    ):
+        """Test that invalidations still reach Redis after a failed read"""
+        url = f"/public/snippets/{test_public_snippet.id}"
+        assert client.get(url).status_code == status.HTTP_200_OK
+
+        def failing_mget(keys):
+            raise redis.ConnectionError("Redis is down")
+
+        with monkeypatch.context() as patched:
+            patched.setattr(fake_cache, "mget", failing_mget)
+            assert client.get(url).status_code == status.HTTP_200_OK
+
+        response = client.patch(
+            f"/snippets/{test_public_snippet.id}/toggle-public", headers=auth_headers
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+        # Once the retry window ends, the cached public body must be gone
+        monkeypatch.setattr(cache, "_unavailable_until", 0.0)
+        response = client.get(url)
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_public_snippet_list_cache_invalidation(
+        self, client, fake_cache, auth_headers
+    ):
+        """Test that creating a public snippet invalidates cached lists"""
+        url = "/public/snippets/?language=cachelang"
+        response = client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == []
+
+        snippet_data = {
+            "title": "Freshly Public Snippet",
+            "code": "print('fresh')",
+            "language": "cachelang",
+            "is_public": True,
+        }
+        response = client.post("/snippets/", json=snippet_data, headers=auth_headers)
+        assert response.status_code == status.HTTP_201_CREATED
+        new_id = response.json()["id"]
+
+        response = client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert [s["id"] for s in response.json()] == [new_id]
+
+    def test_public_snippets_cursor_survives_cache(
+        self, client, fake_cache, db_session, test_user
+    ):
+        """Test that cached public pages keep their next-page cursor"""
+        for i in range(3):
+            db_session.add(
+                Snippet(
+                    title=f"Cursor Snippet {i}",
+                    code=f"print({i})",
+                    language="cursorlang",
+                    is_public=True,
+                    user_id=test_user.id,
+                )
+            )
+        db_session.commit()
+
+        url = "/public/snippets/?language=cursorlang&limit=2"
+        first = client.get(url)
+        cached = client.get(url)
+
+        assert first.status_code == status.HTTP_200_OK
+        assert cached.json() == first.json()
+        assert cached.headers["X-Next-Cursor"] == first.headers["X-Next-Cursor"]
+
+        response = client.get(f"{url}&cursor={first.headers['X-Next-Cursor']}")
+        assert len(response.json()) == 1
@@ -1,26 +1,31 @@
-import pytest
+import base64
+import json
 from fastapi import status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
 
-from models import Snippet, Tag
+from models import Snippet, Tag, snippet_tags
+
+# Request bodies shared by tests that post them unchanged
+_SNIPPET_PAYLOAD = {
+    "title": "Test Snippet",
+    "code": "print('Hello, World!')",
+    "language": "python",
+    "description": "A test snippet",
+    "is_public": False,
+    "tags": ["python", "test"],
+}
 
 
 class TestSnippetCRUD:
     """Test snippet CRUD operations"""
 
-    def test_create_snippet_success(self, client, test_user_token):
+    def test_create_snippet_success(self, client, auth_headers):
         """Test successful snippet creation"""
-        headers = {"Authorization": f"Bearer {test_user_token}"}
-        snippet_data = {
-            "title": "Test Snippet",
-            "code": "print('Hello, World!')",
-            "language": "python",
-            "description": "A test snippet",
-            "is_public": False,
-            "tags": ["python", "test"],
-        }
-
-        response = client.post("/snippets/", json=snippet_data, headers=headers)
+        response = client.post(
+            "/snippets/",
+            json=_SNIPPET_PAYLOAD,
+            headers=auth_headers,
+        )
 
         assert response.status_code == status.HTTP_201_CREATED
         data = response.json()
@@ -35,21 +40,12 @@ class TestSnippetCRUD:
 
     def test_create_snippet_without_auth(self, client):
         """Test snippet creation without authentication"""
-        snippet_data = {
-            "title": "Test Snippet",
-            "code": "print('Hello, World!')",
-            "language": "python",
-            "description": "A test snippet",
-            "is_public": False,
-        }
-
-        response = client.post("/snippets/", json=snippet_data)
+        response = client.post("/snippets/", json=_SNIPPET_PAYLOAD)
 
         assert response.status_code == status.HTTP_403_FORBIDDEN
 
-    def test_create_snippet_invalid_data(self, client, test_user_token):
+    def test_create_snippet_invalid_data(self, client, auth_headers):
         """Test snippet creation with invalid data"""
-        headers = {"Authorization": f"Bearer {test_user_token}"}
         snippet_data = {
             "title": "",  # Empty title
             "code": "",  # Empty code
@@ -57,31 +53,69 @@ class TestSnippetCRUD:
             "is_public": False,
         }
 
-        response = client.post("/snippets/", json=snippet_data, headers=headers)
+        response = client.post("/snippets/", json=snippet_data, headers=auth_headers)
 
         assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
 
-    def test_get_user_snippets(self, client, test_user_token, test_snippet):
+    def test_create_snippet_strips_whitespace(self, client, auth_headers):
+        """Test that text fields are stripped and blank ones rejected"""
+        snippet_data = {
+            "title": "  Padded Title  ",
+            "code": "\nprint('padded')\n",
+            "language": " python ",
+        }
+
+        response = client.post("/snippets/", json=snippet_data, headers=auth_headers)
+        assert response.status_code == status.HTTP_201_CREATED
+        data = response.json()
+        assert data["title"] == "Padded Title"
+        assert data["code"] == "print('padded')"
+        assert data["language"] == "python"
+
+        response = client.post(
+            "/snippets/", json={**snippet_data, "title": "   "}, headers=auth_headers
+        )
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    def test_get_user_snippets(
+        self,
+        client,
+        db_session,
+        test_user,
+        auth_headers,
+        test_snippet,
+        sql_statements,
+    ):
         """Test getting user's snippets"""
-        headers = {"Authorization": f"Bearer {test_user_token}"}
-        response = client.get("/snippets/", headers=headers)
+        # A second snippet, so a per-snippet tag query would show up below
+        db_session.add(
+            Snippet(
+                title="Second Snippet",
+                code="print('second')",
+                language="python",
+                user_id=test_user.id,
+                tags=[Tag(name="second")],
+            )
+        )
+        db_session.commit()
+        sql_statements.clear()
+
+        response = client.get("/snippets/", headers=auth_headers)
 
         assert response.status_code == status.HTTP_200_OK
+        # The user lookup, the page and its tags, however many snippets
+        assert len(sql_statements) <= 3
         data = response.json()
         assert isinstance(data, list)
         assert len(data) >= 1
 
         # Check that we get the test snippet
-        snippet_found = False
-        for snippet in data:
-            if snippet["id"] == test_snippet.id:
-                snippet_found = True
-                assert snippet["title"] == "Test Snippet"
-                assert snippet["code"] == "print('Hello, World!')"
-                assert snippet["language"] == "python"
-                break
-
-        assert snippet_found
+        snippets = {snippet["id"]: snippet for snippet in data}
+        assert test_snippet.id in snippets
+        snippet = snippets[test_snippet.id]
+        assert snippet["title"] == "Test Snippet"
+        assert snippet["code"] == "print('Hello, World!')"
+        assert snippet["language"] == "python"
 
     def test_get_user_snippets_without_auth(self, client):
         """Test getting snippets without authentication"""
@@ -89,10 +123,9 @@ class TestSnippetCRUD:
 
         assert response.status_code == status.HTTP_403_FORBIDDEN
 
-    def test_get_specific_snippet(self, client, test_user_token, test_snippet):
+    def test_get_specific_snippet(self, client, auth_headers, test_snippet):
         """Test getting a specific snippet"""
-        headers = {"Authorization": f"Bearer {test_user_token}"}
-        response = client.get(f"/snippets/{test_snippet.id}", headers=headers)
+        response = client.get(f"/snippets/{test_snippet.id}", headers=auth_headers)
 
         assert response.status_code == status.HTTP_200_OK
         data = response.json()
@@ -101,16 +134,14 @@ class TestSnippetCRUD:
         assert data["code"] == "print('Hello, World!')"
         assert data["language"] == "python"
 
-    def test_get_snippet_not_found(self, client, test_user_token):
+    def test_get_snippet_not_found(self, client, auth_headers):
         """Test getting a non-existent snippet"""
-        headers = {"Authorization": f"Bearer {test_user_token}"}
-        response = client.get("/snippets/999", headers=headers)
+        response = client.get("/snippets/999", headers=auth_headers)
 
         assert response.status_code == status.HTTP_404_NOT_FOUND
 
-    def test_update_snippet_success(self, client, test_user_token, test_snippet):
+    def test_update_snippet_success(self, client, auth_headers, test_snippet):
         """Test successful snippet update"""
-        headers = {"Authorization": f"Bearer {test_user_token}"}
         update_data = {
             "title": "Updated Snippet",
             "code": "print('Updated code!')",
@@ -120,7 +151,7 @@ class TestSnippetCRUD:
         }
 
         response = client.put(
-            f"/snippets/{test_snippet.id}", json=update_data, headers=headers
+            f"/snippets/{test_snippet.id}", json=update_data, headers=auth_headers
         )
 
         assert response.status_code == status.HTTP_200_OK
@@ -130,115 +161,110 @@ class TestSnippetCRUD:
         assert data["description"] == "Updated description"
         assert data["is_public"] == True
 
-    def test_update_snippet_not_owner(
-        self, client, test_user_token, db_session, test_user
+    def test_update_snippet_single_round_trip(
+        self, client, auth_headers, test_snippet, sql_statements
     ):
-        """Test updating snippet owned by another user"""
-        # Create another user and snippet
-        from models import User
-        from auth import get_password_hash
+        """Test that an update doesn't reload the snippet after the UPDATE"""
+        sql_statements.clear()
+        response = client.put(
+            f"/snippets/{test_snippet.id}",
+            json={"title": "Updated Snippet"},
+            headers=auth_headers,
+        )
 
-        # Check if other user already exists
-        existing_other_user = (
-            db_session.query(User).filter(User.username == "otheruser").first()
+        assert response.status_code == status.HTTP_200_OK
+        update_index = next(
+            index
+            for index, statement in enumerate(sql_statements)
+            if statement.startswith("UPDATE snippets")
         )
-        if existing_other_user:
-            other_user = existing_other_user
-        else:
-            other_user = User(
-                username="otheruser",
-                email="other@example.com",
-                hashed_password=get_password_hash("password123"),
-            )
-            db_session.add(other_user)
-            db_session.commit()
-
-        other_snippet = Snippet(
-            title="Other User's Snippet",
-            code="print('Other user code')",
-            language="python",
-            user_id=other_user.id,
+        # Only the response's tag load may follow; the row itself isn't reloaded
+        after_update = sql_statements[update_index + 1 :]
+        assert len(after_update) <= 1
+        assert not any("FROM snippets \n" in statement for statement in after_update)
+
+    def test_update_snippet_tags_only(self, client, auth_headers, test_snippet):
+        """Test replacing a snippet's tags without touching other fields"""
+        response = client.put(
+            f"/snippets/{test_snippet.id}",
+            json={"tags": ["Replaced", "tags"]},
+            headers=auth_headers,
         )
-        db_session.add(other_snippet)
-        db_session.commit()
 
-        headers = {"Authorization": f"Bearer {test_user_token}"}
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data["title"] == "Test Snippet"
+        assert [tag["name"] for tag in data["tags"]] == ["replaced", "tags"]
+
+    def test_update_snippet_not_owner(self, client, auth_headers, other_user_snippet):
+        """Test updating snippet owned by another user"""
         update_data = {"title": "Unauthorized Update"}
 
         response = client.put(
-            f"/snippets/{other_snippet.id}", json=update_data, headers=headers
+            f"/snippets/{other_user_snippet.id}", json=update_data, headers=auth_headers
         )
 
         assert response.status_code == status.HTTP_404_NOT_FOUND
 
-    def test_delete_snippet_success(self, client, test_user_token, test_snippet):
+    def test_delete_snippet_success(self, client, auth_headers, test_snippet):
         """Test successful snippet deletion"""
-        headers = {"Authorization": f"Bearer {test_user_token}"}
-        response = client.delete(f"/snippets/{test_snippet.id}", headers=headers)
+        response = client.delete(f"/snippets/{test_snippet.id}", headers=auth_headers)
 
         assert response.status_code == status.HTTP_204_NO_CONTENT
 
-    def test_delete_snippet_not_owner(
-        self, client, test_user_token, db_session, test_user
-    ):
-        """Test deleting snippet owned by another user"""
-        # Create another user and snippet
-        from models import User
-        from auth import get_password_hash
-
-        # Check if other user already exists
-        existing_other_user = (
-            db_session.query(User).filter(User.username == "otheruser").first()
-        )
-        if existing_other_user:
-            other_user = existing_other_user
-        else:
-            other_user = User(
-                username="otheruser",
-                email="other@example.com",
-                hashed_password=get_password_hash("password123"),
-            )
-            db_session.add(other_user)
-            db_session.commit()
-
-        other_snippet = Snippet(
-            title="Other User's Snippet",
-            code="print('Other user code')",
-            language="python",
-            user_id=other_user.id,
+    def test_delete_snippet_with_tags(self, client, auth_headers, db_session):
+        """Test that deleting a snippet also removes its tag associations"""
+        response = client.post(
+            "/snippets/",
+            json={
+                "title": "Tagged Snippet",
+                "code": "print('tagged')",
+                "language": "python",
+                "tags": ["deleteme"],
+            },
+            headers=auth_headers,
         )
-        db_session.add(other_snippet)
-        db_session.commit()
+        snippet_id = response.json()["id"]
 
-        headers = {"Authorization": f"Bearer {test_user_token}"}
-        response = client.delete(f"/snippets/{other_snippet.id}", headers=headers)
+        response = client.delete(f"/snippets/{snippet_id}", headers=auth_headers)
+        assert response.status_code == status.HTTP_204_NO_CONTENT
 
+        response = client.get(f"/snippets/{snippet_id}", headers=auth_headers)
         assert response.status_code == status.HTTP_404_NOT_FOUND
+        remaining = db_session.execute(
+            select(snippet_tags).where(snippet_tags.c.snippet_id == snippet_id)
+        ).all()
+        assert remaining == []
 
-    def test_toggle_snippet_visibility(self, client, test_user_token, test_snippet):
-        """Test toggling snippet visibility"""
-        headers = {"Authorization": f"Bearer {test_user_token}"}
+    def test_delete_snippet_not_owner(self, client, auth_headers, other_user_snippet):
+        """Test deleting snippet owned by another user"""
+        response = client.delete(
+            f"/snippets/{other_user_snippet.id}", headers=auth_headers
+        )
 
-        # Toggle to public
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_toggle_to_public(self, client, auth_headers, test_snippet):
+        """Test toggling a private snippet to public"""
         response = client.patch(
-            f"/snippets/{test_snippet.id}/toggle-public", headers=headers
+            f"/snippets/{test_snippet.id}/toggle-public", headers=auth_headers
         )
         assert response.status_code == status.HTTP_200_OK
         data = response.json()
         assert data["is_public"] == True
 
-        # Toggle back to private
+    def test_toggle_back_to_private(self, client, auth_headers, test_public_snippet):
+        """Test toggling a public snippet back to private"""
         response = client.patch(
-            f"/snippets/{test_snippet.id}/toggle-public", headers=headers
+            f"/snippets/{test_public_snippet.id}/toggle-public", headers=auth_headers
         )
         assert response.status_code == status.HTTP_200_OK
         data = response.json()
         assert data["is_public"] == False
 
-    def test_filter_snippets_by_language(self, client, test_user_token, test_snippet):
+    def test_filter_snippets_by_language(self, client, auth_headers, test_snippet):
         """Test filtering snippets by language"""
-        headers = {"Authorization": f"Bearer {test_user_token}"}
-        response = client.get("/snippets/?language=python", headers=headers)
+        response = client.get("/snippets/?language=python", headers=auth_headers)
 
         assert response.status_code == status.HTTP_200_OK
         data = response.json()
@@ -248,12 +274,9 @@ class TestSnippetCRUD:
         for snippet in data:
             assert snippet["language"] == "python"
 
-    def test_filter_snippets_by_public_status(
-        self, client, test_user_token, test_snippet
-    ):
+    def test_filter_snippets_by_public_status(self, client, auth_headers, test_snippet):
         """Test filtering snippets by public status"""
-        headers = {"Authorization": f"Bearer {test_user_token}"}
-        response = client.get("/snippets/?is_public=false", headers=headers)
+        response = client.get("/snippets/?is_public=false", headers=auth_headers)
 
         assert response.status_code == status.HTTP_200_OK
         data = response.json()
@@ -262,3 +285,109 @@ class TestSnippetCRUD:
         # All snippets should be private
         for snippet in data:
             assert snippet["is_public"] == False
+
+    def test_snippets_cursor_pagination(self, client, auth_headers):
+        """Test paging through snippets with the next-page cursor"""
+        created_ids = []
+        for i in range(3):
+            response = client.post(
+                "/snippets/",
+                json={
+                    "title": f"Paged Snippet {i}",
+                    "code": f"print({i})",
+                    "language": "pagedlang",
+                },
+                headers=auth_headers,
+            )
+            created_ids.append(response.json()["id"])
+
+        response = client.get(
+            "/snippets/?language=pagedlang&limit=2", headers=auth_headers
+        )
+        assert response.status_code == status.HTTP_200_OK
+        first_page = [snippet["id"] for snippet in response.json()]
+        assert first_page == created_ids[:0:-1]  # Newest first
+        cursor = response.headers["X-Next-Cursor"]
+
+        response = client.get(
+            f"/snippets/?language=pagedlang&limit=2&cursor={cursor}",
+            headers=auth_headers,
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert [snippet["id"] for snippet in response.json()] == created_ids[:1]
+        assert "X-Next-Cursor" not in response.headers
+
+        # Offset pages use the same newest-first order
+        response = client.get(
+            "/snippets/?language=pagedlang&skip=2&limit=2", headers=auth_headers
+        )
+        assert [snippet["id"] for snippet in response.json()] == created_ids[:1]
+
+    def test_snippets_invalid_cursor(self, client, auth_headers):
+        """Test that malformed and out-of-range cursors are rejected"""
+        response = client.get("/snippets/?cursor=not-a-cursor", headers=auth_headers)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+        # Decodes to an integer too large to bind as a snippet id
+        huge_cursor = base64.urlsafe_b64encode(b"9" * 30).decode()
+        response = client.get(f"/snippets/?cursor={huge_cursor}", headers=auth_headers)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+        response = client.get(f"/public/snippets/?cursor={huge_cursor}")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_snippets_list_compressed(self, client, auth_headers):
+        """Test that large list responses are gzip-compressed"""
+        client.post(
+            "/snippets/",
+            json={
+                "title": "Large Snippet",
+                "code": "print('hello world')\n" * 200,
+                "language": "gziplang",
+            },
+            headers=auth_headers,
+        )
+
+        response = client.get(
+            "/snippets/?language=gziplang",
+            headers={**auth_headers, "Accept-Encoding": "gzip"},
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.json()[0]["title"] == "Large Snippet"
+
+    def test_snippets_pagination_bounds(self, client, auth_headers):
+        """Test that out-of-range skip/limit values are rejected"""
+        for params in ("limit=0", "limit=201", "skip=-1", "skip=10001"):
+            response = client.get(f"/snippets/?{params}", headers=auth_headers)
+            assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+        response = client.get("/snippets/?skip=10000&limit=200", headers=auth_headers)
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_stream_snippets(self, client, auth_headers):
+        """Test exporting snippets as newline-delimited JSON"""
+        for i in range(3):
+            client.post(
+                "/snippets/",
+                json={
+                    "title": f"Streamed Snippet {i}",
+                    "code": f"print({i})",
+                    "language": "streamlang",
+                    "tags": ["export"],
+                },
+                headers=auth_headers,
+            )
+
+        response = client.get(
+            "/snippets/stream?language=streamlang", headers=auth_headers
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["Content-Type"] == "application/x-ndjson"
+
+        snippets = [json.loads(line) for line in response.text.splitlines()]
+        assert [snippet["title"] for snippet in snippets] == [
+            f"Streamed Snippet {i}" for i in (2, 1, 0)
+        ]
+        assert all(snippet["tags"][0]["name"] == "export" for snippet in snippets)
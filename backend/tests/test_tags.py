@@ -1,17 +1,33 @@
 import pytest
 from fastapi import status
-from sqlalchemy.orm import Session
+from sqlalchemy import insert
 
+import main
 from models import Tag, Snippet
 
+# Request bodies shared by tests that post them unchanged
+_TAGGED_SNIPPET_PAYLOAD = {
+    "title": "Test Snippet with Tags",
+    "code": "print('Hello, World!')",
+    "language": "python",
+    "description": "A test snippet with tags",
+    "is_public": False,
+    "tags": ["python", "test", "example"],
+}
+_NEW_TAGS_SNIPPET_PAYLOAD = {
+    "title": "New Snippet",
+    "code": "print('new')",
+    "language": "python",
+    "tags": ["newtag", "anothertag"],
+}
+
 
 class TestTagManagement:
     """Test tag management functionality"""
 
-    def test_get_tags(self, client, test_user_token, test_tag):
+    def test_get_tags(self, client, auth_headers, test_tag):
         """Test getting all tags"""
-        headers = {"Authorization": f"Bearer {test_user_token}"}
-        response = client.get("/tags/", headers=headers)
+        response = client.get("/tags/", headers=auth_headers)
 
         assert response.status_code == status.HTTP_200_OK
         data = response.json()
@@ -19,14 +35,9 @@ class TestTagManagement:
         assert len(data) >= 1
 
         # Check that we get the test tag
-        tag_found = False
-        for tag in data:
-            if tag["id"] == test_tag.id:
-                tag_found = True
-                assert tag["name"] == "python"
-                break
-
-        assert tag_found
+        tags = {tag["id"]: tag for tag in data}
+        assert test_tag.id in tags
+        assert tags[test_tag.id]["name"] == "python"
 
     def test_get_tags_without_auth(self, client):
         """Test getting tags without authentication"""
@@ -36,12 +47,11 @@ class TestTagManagement:
             response.status_code == status.HTTP_200_OK
         )  # Tags endpoint might be public
 
-    def test_create_tag_success(self, client, test_user_token):
+    def test_create_tag_success(self, client, auth_headers):
         """Test successful tag creation"""
-        headers = {"Authorization": f"Bearer {test_user_token}"}
         tag_data = {"name": "uniquetag123"}
 
-        response = client.post("/tags/", json=tag_data, headers=headers)
+        response = client.post("/tags/", json=tag_data, headers=auth_headers)
 
         assert response.status_code == status.HTTP_201_CREATED
         data = response.json()
@@ -49,22 +59,22 @@ class TestTagManagement:
         assert "id" in data
         assert "created_at" in data
 
-    def test_create_duplicate_tag(self, client, test_user_token, test_tag):
-        """Test creating a tag with existing name"""
-        headers = {"Authorization": f"Bearer {test_user_token}"}
-        tag_data = {"name": "python"}  # Same as test_tag
+    @pytest.mark.parametrize("name", ["python", "PYTHON", "Python"])
+    def test_create_duplicate_tag(self, client, auth_headers, test_tag, name):
+        """Test creating a tag with an existing name, in any letter case"""
+        tag_data = {"name": name}  # Same as test_tag
 
-        response = client.post("/tags/", json=tag_data, headers=headers)
+        response = client.post("/tags/", json=tag_data, headers=auth_headers)
 
         assert response.status_code == status.HTTP_400_BAD_REQUEST
-        assert "already exists" in response.json()["detail"]
+        data = response.json()
+        assert "already exists" in data["detail"]
 
-    def test_create_tag_invalid_data(self, client, test_user_token):
+    def test_create_tag_invalid_data(self, client, auth_headers):
         """Test creating tag with invalid data"""
-        headers = {"Authorization": f"Bearer {test_user_token}"}
         tag_data = {"name": ""}  # Empty name
 
-        response = client.post("/tags/", json=tag_data, headers=headers)
+        response = client.post("/tags/", json=tag_data, headers=auth_headers)
 
         assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
 
@@ -76,19 +86,13 @@ class TestTagManagement:
 
         assert response.status_code == status.HTTP_403_FORBIDDEN
 
-    def test_snippet_with_tags(self, client, test_user_token, db_session):
+    def test_snippet_with_tags(self, client, auth_headers, db_session):
         """Test creating a snippet with tags"""
-        headers = {"Authorization": f"Bearer {test_user_token}"}
-        snippet_data = {
-            "title": "Test Snippet with Tags",
-            "code": "print('Hello, World!')",
-            "language": "python",
-            "description": "A test snippet with tags",
-            "is_public": False,
-            "tags": ["python", "test", "example"],
-        }
-
-        response = client.post("/snippets/", json=snippet_data, headers=headers)
+        response = client.post(
+            "/snippets/",
+            json=_TAGGED_SNIPPET_PAYLOAD,
+            headers=auth_headers,
+        )
 
         assert response.status_code == status.HTTP_201_CREATED
         data = response.json()
@@ -96,14 +100,71 @@ class TestTagManagement:
         assert len(data["tags"]) >= 1
 
         # Check that tags were created
+        tag_names = {tag["name"] for tag in data["tags"]}
+        assert {"python", "test", "example"} <= tag_names
+
+    def test_snippet_with_duplicate_tags(self, client, auth_headers):
+        """Test that repeated tag names on one snippet are merged"""
+        snippet_data = {
+            "title": "Snippet with Duplicate Tags",
+            "code": "print('dupes')",
+            "language": "python",
+            "tags": ["Python", "python", "dupetag", "DUPETAG"],
+        }
+
+        response = client.post("/snippets/", json=snippet_data, headers=auth_headers)
+
+        assert response.status_code == status.HTTP_201_CREATED
+        data = response.json()
         tag_names = [tag["name"] for tag in data["tags"]]
-        assert "python" in tag_names
-        assert "test" in tag_names
-        assert "example" in tag_names
+        assert sorted(tag_names) == ["dupetag", "python"]
 
-    def test_snippet_tags_retrieval(
-        self, client, test_user_token, db_session, test_user
+    def test_snippet_with_existing_and_new_tags(self, client, auth_headers):
+        """Test that existing tags are reused alongside newly created ones"""
+        response = client.post(
+            "/tags/", json={"name": "reusedtag"}, headers=auth_headers
+        )
+        reused_id = response.json()["id"]
+
+        response = client.post(
+            "/snippets/",
+            json={
+                "title": "Snippet with Mixed Tags",
+                "code": "print('mixed')",
+                "language": "python",
+                "tags": ["freshtag1", "reusedtag", "freshtag2"],
+            },
+            headers=auth_headers,
+        )
+
+        assert response.status_code == status.HTTP_201_CREATED
+        tags = response.json()["tags"]
+        assert {tag["name"] for tag in tags} == {"freshtag1", "reusedtag", "freshtag2"}
+        assert next(t["id"] for t in tags if t["name"] == "reusedtag") == reused_id
+
+    def test_snippet_tags_without_upsert_support(
+        self, client, auth_headers, test_tag, monkeypatch
     ):
+        """Test tag creation on dialects without ON CONFLICT DO NOTHING"""
+        monkeypatch.setattr(main, "_UPSERT_INSERTS", {})
+
+        response = client.post(
+            "/snippets/",
+            json={
+                "title": "Portable Tags Snippet",
+                "code": "print('portable')",
+                "language": "python",
+                "tags": ["python", "portabletag"],
+            },
+            headers=auth_headers,
+        )
+
+        assert response.status_code == status.HTTP_201_CREATED
+        tags = {tag["name"]: tag["id"] for tag in response.json()["tags"]}
+        assert tags.keys() == {"python", "portabletag"}
+        assert tags["python"] == test_tag.id
+
+    def test_snippet_tags_retrieval(self, client, auth_headers, db_session, test_user):
         """Test that snippet tags are properly retrieved"""
         # Create a snippet with tags
         snippet = Snippet(
@@ -134,91 +195,94 @@ class TestTagManagement:
         # Associate tags with snippet (simplified for testing)
         # In real implementation, this would be done through the snippet creation endpoint
 
-        headers = {"Authorization": f"Bearer {test_user_token}"}
-        response = client.get(f"/snippets/{snippet.id}", headers=headers)
+        response = client.get(f"/snippets/{snippet.id}", headers=auth_headers)
 
         assert response.status_code == status.HTTP_200_OK
         data = response.json()
         assert "tags" in data
 
-    def test_filter_snippets_by_tag(
-        self, client, test_user_token, db_session, test_user
-    ):
+    def test_filter_snippets_by_tag(self, client, auth_headers, db_session, test_user):
         """Test filtering snippets by tag"""
         # Create snippets with different tags
-        snippet1 = Snippet(
-            title="Python Snippet",
-            code="print('python')",
-            language="python",
-            user_id=test_user.id,
+        db_session.execute(
+            insert(Snippet),
+            [
+                {
+                    "title": "Python Snippet",
+                    "code": "print('python')",
+                    "language": "python",
+                    "user_id": test_user.id,
+                },
+                {
+                    "title": "JavaScript Snippet",
+                    "code": "console.log('js')",
+                    "language": "javascript",
+                    "user_id": test_user.id,
+                },
+            ],
         )
-        db_session.add(snippet1)
-
-        snippet2 = Snippet(
-            title="JavaScript Snippet",
-            code="console.log('js')",
-            language="javascript",
-            user_id=test_user.id,
-        )
-        db_session.add(snippet2)
-
         db_session.commit()
 
-        headers = {"Authorization": f"Bearer {test_user_token}"}
-        response = client.get("/snippets/?tag=python", headers=headers)
+        response = client.get("/snippets/?tag=python", headers=auth_headers)
 
         assert response.status_code == status.HTTP_200_OK
         data = response.json()
         assert isinstance(data, list)
 
-    def test_tag_case_insensitivity(self, client, test_user_token):
-        """Test that tag names are case-insensitive"""
-        headers = {"Authorization": f"Bearer {test_user_token}"}
+    def test_filter_snippets_by_multiple_tags(self, client, auth_headers):
+        """Test that filtering by several tags requires all of them"""
+        both = client.post(
+            "/snippets/",
+            json={
+                "title": "Both Tags",
+                "code": "print('both')",
+                "language": "python",
+                "tags": ["filtera", "filterb"],
+            },
+            headers=auth_headers,
+        ).json()
+        client.post(
+            "/snippets/",
+            json={
+                "title": "One Tag",
+                "code": "print('one')",
+                "language": "python",
+                "tags": ["filtera"],
+            },
+            headers=auth_headers,
+        )
 
-        # Create tag with uppercase
-        tag_data = {"name": "PYTHON"}
-        response = client.post("/tags/", json=tag_data, headers=headers)
-        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        response = client.get(
+            "/snippets/?tag=filtera&tag=FILTERB", headers=auth_headers
+        )
 
-        # Try to create same tag with lowercase
-        tag_data = {"name": "python"}
-        response = client.post("/tags/", json=tag_data, headers=headers)
-        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.status_code == status.HTTP_200_OK
+        assert [snippet["id"] for snippet in response.json()] == [both["id"]]
 
-    def test_tag_name_validation(self, client, test_user_token):
+    @pytest.mark.parametrize(
+        "invalid_name", ["", "   ", "a" * 51], ids=["empty", "blank", "too-long"]
+    )
+    def test_tag_name_validation(self, client, auth_headers, invalid_name):
         """Test tag name validation"""
-        headers = {"Authorization": f"Bearer {test_user_token}"}
-
-        # Test various invalid tag names
-        invalid_names = [
-            "",  # Empty
-            "a" * 51,  # Too long
-        ]
+        tag_data = {"name": invalid_name}
+        response = client.post("/tags/", json=tag_data, headers=auth_headers)
 
-        for name in invalid_names:
-            tag_data = {"name": name}
-            response = client.post("/tags/", json=tag_data, headers=headers)
-            # With proper validation, invalid names should return 422
-            assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+        # With proper validation, invalid names should return 422
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
 
-    def test_tag_creation_with_snippet(self, client, test_user_token):
+    def test_tag_creation_with_snippet(self, client, auth_headers):
         """Test that tags are created when creating a snippet"""
-        headers = {"Authorization": f"Bearer {test_user_token}"}
-        snippet_data = {
-            "title": "New Snippet",
-            "code": "print('new')",
-            "language": "python",
-            "tags": ["newtag", "anothertag"],
-        }
-
-        response = client.post("/snippets/", json=snippet_data, headers=headers)
+        response = client.post(
+            "/snippets/",
+            json=_NEW_TAGS_SNIPPET_PAYLOAD,
+            headers=auth_headers,
+        )
         assert response.status_code == status.HTTP_201_CREATED
 
         # Check that tags were created
-        tag_response = client.get("/tags/", headers=headers)
+        tag_response = client.get("/tags/", headers=auth_headers)
         assert tag_response.status_code == status.HTTP_200_OK
         tags = tag_response.json()
 
-        tag_names = [tag["name"] for tag in tags]
-        assert "newtag" in tag_names
-        assert "anothertag" in tag_names
+        tag_names = {tag["name"] for tag in tags}
+        assert {"newtag", "anothertag"} <= tag_names